@@ -0,0 +1,327 @@
+"""
+Long-lived audio output sinks.
+A sink stays open for the whole session and takes float32 PCM frames directly,
+so playing a chunk is a buffer copy instead of a temp file and a new process.
+Frames are clipped while they are copied into a preallocated ring buffer and handed
+to the player from a preallocated block; int16 conversion happens only for players
+configured with the s16 format.
+"""
+
+import shutil
+import subprocess
+import time
+from threading import Condition, Event, Lock, Thread
+
+import numpy as np
+
+import LOGS
+import TRACING
+
+SAMPLE_RATE = 24000
+
+# Sample format name -> (ffplay, pacat, aplay) spelling
+SAMPLE_FORMATS = {
+    "f32": ("f32le", "float32le", "FLOAT_LE"),
+    "s16": ("s16le", "s16le", "S16_LE"),
+}
+
+# Raw mono PCM on stdin for each supported player
+PLAYER_COMMANDS = {
+    "ffplay": lambda rate, fmt: [
+        "ffplay", "-nodisp", "-hide_banner", "-loglevel", "quiet",
+        "-fflags", "nobuffer", "-probesize", "32", "-analyzeduration", "0",
+        "-f", SAMPLE_FORMATS[fmt][0], "-ar", str(rate), "-ac", "1", "-i", "pipe:0",
+    ],
+    "pacat": lambda rate, fmt: [
+        "pacat", "--raw", f"--format={SAMPLE_FORMATS[fmt][1]}", f"--rate={rate}", "--channels=1",
+    ],
+    "aplay": lambda rate, fmt: [
+        "aplay", "-q", "-t", "raw", "-f", SAMPLE_FORMATS[fmt][2], "-r", str(rate), "-c", "1",
+    ],
+}
+
+
+class RING_BUFFER:
+    """Fixed-size float32 ring buffer shared between a producer and one consumer thread."""
+
+    def __init__(self, capacity: int):
+        self.capacity = int(capacity)
+        self._data = np.zeros(self.capacity, dtype=np.float32)
+        self._read_pos = 0
+        self._size = 0
+        self._cond = Condition()
+        self._closed = False
+
+    def __len__(self):
+        return self._size
+
+    def free(self) -> int:
+        return self.capacity - self._size
+
+    def write(self, frames: np.ndarray, stop_event: Event | None = None, block: bool = True,
+              clip: bool = False) -> int:
+        """Copy frames into the buffer, blocking while it is full unless block=False. Returns frames written.
+        With clip=True samples are clipped to [-1, 1] as part of the copy."""
+        written = 0
+        total = len(frames)
+        with self._cond:
+            while written < total:
+                while self.free() == 0 and not self._closed:
+                    if not block or (stop_event is not None and stop_event.is_set()):
+                        return written
+                    self._cond.wait(timeout=0.05)
+                if self._closed:
+                    return written
+                n = min(self.free(), total - written)
+                start = (self._read_pos + self._size) % self.capacity
+                first = min(n, self.capacity - start)
+                self._copy_in(frames[written:written + first], self._data[start:start + first], clip)
+                if n > first:
+                    self._copy_in(frames[written + first:written + n], self._data[:n - first], clip)
+                self._size += n
+                written += n
+                self._cond.notify_all()
+        return written
+
+    @staticmethod
+    def _copy_in(source, target, clip):
+        if clip:
+            np.clip(source, -1.0, 1.0, out=target)
+        else:
+            target[:] = source
+
+    def read_into(self, out: np.ndarray, timeout: float | None = None) -> int:
+        """Move up to len(out) frames into a caller-owned array, waiting for data.
+        Returns the number of frames moved; 0 on timeout or close."""
+        with self._cond:
+            if self._size == 0 and not self._closed:
+                self._cond.wait(timeout=timeout)
+            if self._size == 0:
+                return 0
+            n = min(len(out), self._size)
+            first = min(n, self.capacity - self._read_pos)
+            out[:first] = self._data[self._read_pos:self._read_pos + first]
+            if n > first:
+                out[first:n] = self._data[:n - first]
+            self._read_pos = (self._read_pos + n) % self.capacity
+            self._size -= n
+            self._cond.notify_all()
+            return n
+
+    def read(self, max_frames: int, timeout: float | None = None) -> np.ndarray | None:
+        """Take up to max_frames frames into a new array. Returns None on timeout or close."""
+        out = np.empty(max_frames, dtype=np.float32)
+        n = self.read_into(out, timeout)
+        return out[:n] if n else None
+
+    def wait_empty(self, timeout: float | None = None) -> bool:
+        with self._cond:
+            return self._cond.wait_for(lambda: self._size == 0 or self._closed, timeout=timeout)
+
+    def clear(self):
+        with self._cond:
+            self._read_pos = 0
+            self._size = 0
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class AUDIO_SINK:
+    """Base sink: keeps a playback clock so callers can wait for audio to finish."""
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self._clock_lock = Lock()
+        self._play_until = 0.0  # monotonic time at which queued audio finishes playing
+
+    def _advance_clock(self, frames: int) -> float:
+        """Account for frames handed to the device; returns when they start playing."""
+        with self._clock_lock:
+            start = max(time.monotonic(), self._play_until)
+            self._play_until = start + frames / self.sample_rate
+            return start
+
+    def _reset_clock(self):
+        with self._clock_lock:
+            self._play_until = 0.0
+
+    def write(self, audio: np.ndarray, stop_event: Event | None = None):
+        raise NotImplementedError
+
+    def write_nowait(self, audio: np.ndarray) -> int:
+        """Write as many frames as fit without blocking. Returns frames accepted."""
+        self.write(audio)
+        return len(audio)
+
+    def pending_seconds(self) -> float:
+        """Seconds of audio accepted but not yet played."""
+        return max(0.0, self._play_until - time.monotonic())
+
+    def drain(self, stop_event: Event | None = None):
+        """Block until everything written so far has been played."""
+        while True:
+            remaining = self._play_until - time.monotonic()
+            if remaining <= 0 or (stop_event is not None and stop_event.is_set()):
+                return
+            time.sleep(min(remaining, 0.05))
+
+    def clear(self):
+        """Drop audio that has not been played yet."""
+        self._reset_clock()
+
+    def close(self):
+        pass
+
+
+class NULL_SINK(AUDIO_SINK):
+    """Discards audio. With realtime=True it still paces drain() like a real device."""
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE, realtime: bool = False):
+        super().__init__(sample_rate)
+        self.realtime = realtime
+        self.frames_written = 0
+
+    def write(self, audio, stop_event=None):
+        frames = len(audio)
+        self.frames_written += frames
+        if self.realtime:
+            self._advance_clock(frames)
+
+
+class FILE_SINK(AUDIO_SINK):
+    """Appends all audio to a single float WAV file for the whole session."""
+
+    def __init__(self, path: str, sample_rate: int = SAMPLE_RATE):
+        super().__init__(sample_rate)
+        import soundfile as sf
+        self.path = path
+        self._lock = Lock()
+        self._file = sf.SoundFile(path, mode="w", samplerate=sample_rate, channels=1, subtype="FLOAT")
+
+    def write(self, audio, stop_event=None):
+        with self._lock:
+            self._file.write(np.clip(np.asarray(audio, dtype=np.float32), -1.0, 1.0))
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class STREAM_SINK(AUDIO_SINK):
+    """
+    Feeds a single long-running player process from a ring buffer.
+    A writer thread paces output to real time, keeping only `lead` seconds
+    inside the player so clear() can cut playback quickly.
+    """
+
+    def __init__(self, player: str = "ffplay", sample_rate: int = SAMPLE_RATE,
+                 buffer_seconds: float = 3.0, lead: float = 0.2, block_frames: int = 1024,
+                 sample_format: str = "f32"):
+        super().__init__(sample_rate)
+        if player not in PLAYER_COMMANDS:
+            raise ValueError(f"Unknown audio player: {player}")
+        if sample_format not in SAMPLE_FORMATS:
+            raise ValueError(f"Unknown sample format: {sample_format}")
+        if not shutil.which(player):
+            raise FileNotFoundError(f"{player} not found")
+        self.player = player
+        self.sample_format = sample_format
+        self.lead = lead
+        self.block_frames = block_frames
+        self.ring = RING_BUFFER(int(buffer_seconds * sample_rate))
+        # Reused for every block handed to the player; only the writer thread touches them
+        self._block = np.empty(block_frames, dtype=np.float32)
+        self._block_s16 = np.empty(block_frames, dtype=np.int16) if sample_format == "s16" else None
+        self._proc = None
+        self._closed = Event()
+        self._thread = Thread(target=self._writer_loop, name="audio-writer", daemon=True)
+        self._thread.start()
+
+    def _ensure_process(self):
+        if self._proc is None or self._proc.poll() is not None:
+            TRACING.count("subprocess_launches_total", kind="player")
+            self._proc = subprocess.Popen(
+                PLAYER_COMMANDS[self.player](self.sample_rate, self.sample_format),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        return self._proc
+
+    def _writer_loop(self):
+        while not self._closed.is_set():
+            n = self.ring.read_into(self._block, timeout=0.1)
+            if n == 0:
+                continue
+            if self._block_s16 is not None:
+                # Samples are already clipped, so scaling cannot overflow; converts in place
+                np.multiply(self._block[:n], 32767, out=self._block[:n])
+                np.copyto(self._block_s16[:n], self._block[:n], casting="unsafe")
+                data = self._block_s16[:n]
+            else:
+                data = self._block[:n]
+            try:
+                proc = self._ensure_process()
+                # The pipe takes the array's buffer directly, no bytes object is built
+                proc.stdin.write(memoryview(data).cast("B"))
+                proc.stdin.flush()
+            except (BrokenPipeError, OSError) as e:
+                LOGS.log_error(f"Audio output failed, restarting {self.player}: {e}")
+                self._proc = None
+                continue
+            start = self._advance_clock(n)
+            # Stay at most `lead` seconds ahead of the device
+            ahead = start - time.monotonic()
+            if ahead > self.lead:
+                self._closed.wait(ahead - self.lead)
+
+    def write(self, audio, stop_event=None):
+        frames = np.asarray(audio, dtype=np.float32).reshape(-1)
+        self.ring.write(frames, stop_event=stop_event, clip=True)
+
+    def write_nowait(self, audio):
+        frames = np.asarray(audio, dtype=np.float32).reshape(-1)
+        return self.ring.write(frames, block=False, clip=True)
+
+    def pending_seconds(self):
+        return len(self.ring) / self.sample_rate + super().pending_seconds()
+
+    def drain(self, stop_event=None):
+        while not self.ring.wait_empty(timeout=0.05):
+            if stop_event is not None and stop_event.is_set():
+                return
+        super().drain(stop_event)
+
+    def clear(self):
+        self.ring.clear()
+        super().clear()
+
+    def close(self):
+        self._closed.set()
+        self.ring.close()
+        self._thread.join(timeout=1)
+        if self._proc is not None and self._proc.poll() is None:
+            try:
+                self._proc.stdin.close()
+            except OSError:
+                pass
+            self._proc.terminate()
+
+
+def create_sink(kind: str = "ffplay", path: str | None = None, sample_rate: int = SAMPLE_RATE,
+                buffer_seconds: float = 3.0, sample_format: str = "f32") -> AUDIO_SINK:
+    """Build a sink by name: ffplay, pacat, aplay, file or null."""
+    kind = kind.lower()
+    if kind == "null":
+        return NULL_SINK(sample_rate, realtime=True)
+    if kind == "file":
+        return FILE_SINK(path or "luma_output.wav", sample_rate)
+    try:
+        return STREAM_SINK(kind, sample_rate, buffer_seconds=buffer_seconds, sample_format=sample_format)
+    except (FileNotFoundError, ValueError) as e:
+        LOGS.log_error(f"Cannot open audio output '{kind}': {e}. Falling back to null sink.")
+        return NULL_SINK(sample_rate, realtime=True)
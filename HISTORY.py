@@ -0,0 +1,133 @@
+"""
+Token-budgeted conversation history for MAIN_MODEL.
+Keeps the system prompt, drops tool traffic from finished turns and folds
+the oldest turns into a short rolling summary once the budget is exceeded.
+"""
+
+import json
+import re
+
+import LOGS
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:"
+
+
+class HISTORY_MANAGER:
+    def __init__(self, max_tokens=3000, keep_turns=4, summary_tokens=300, chars_per_token=4):
+        self.chars_per_token = chars_per_token
+        self.max_chars = max_tokens * chars_per_token
+        self.keep_turns = keep_turns
+        self.summary_chars = summary_tokens * chars_per_token
+        self.summary_lines = []
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a manager from the [HISTORY] section of config.conf."""
+        return cls(
+            max_tokens=config.getint('HISTORY', 'MAX_TOKENS', fallback=3000),
+            keep_turns=config.getint('HISTORY', 'KEEP_TURNS', fallback=4),
+            summary_tokens=config.getint('HISTORY', 'SUMMARY_TOKENS', fallback=300),
+        )
+
+    def reset(self):
+        self.summary_lines = []
+
+    @staticmethod
+    def _message_chars(message: dict) -> int:
+        size = len(message.get("content") or "")
+        if message.get("tool_calls"):
+            size += len(json.dumps(message["tool_calls"]))
+        return size
+
+    def estimate_tokens(self, messages: list) -> int:
+        return sum(self._message_chars(m) for m in messages) // self.chars_per_token
+
+    @staticmethod
+    def _split_turns(messages: list) -> tuple[list, list]:
+        """Split into leading system messages and turns that each start with a user message."""
+        system, turns = [], []
+        for message in messages:
+            if message["role"] == "system" and not turns:
+                if not (message.get("content") or "").startswith(SUMMARY_PREFIX):
+                    system.append(message)
+            elif message["role"] == "user" or not turns:
+                turns.append([message])
+            else:
+                turns[-1].append(message)
+        return system, turns
+
+    @staticmethod
+    def _strip_tool_traffic(turn: list) -> list:
+        """Keep only what was said in a finished turn; tool calls and results are stale."""
+        kept = []
+        for message in turn:
+            if message["role"] == "tool":
+                continue
+            if message.get("tool_calls"):
+                if not (message.get("content") or "").strip():
+                    continue
+                message = {"role": message["role"], "content": message["content"]}
+            kept.append(message)
+        return kept
+
+    @staticmethod
+    def _first_sentence(text: str, limit: int) -> str:
+        text = " ".join(text.split())
+        match = re.match(r"(.+?[.!?])(\s|$)", text)
+        if match:
+            text = match.group(1)
+        return text if len(text) <= limit else text[:limit - 3].rstrip() + "..."
+
+    def _summarize_turn(self, turn: list):
+        parts = []
+        for message in turn:
+            content = message.get("content") or ""
+            if message["role"] == "user" and content:
+                parts.append(f"User: {self._first_sentence(content, 120)}")
+            elif message["role"] == "assistant" and content:
+                parts.append(f"Luma: {self._first_sentence(content, 160)}")
+        if parts:
+            self.summary_lines.append(" / ".join(parts))
+        # The summary itself rolls: oldest lines go first
+        while self.summary_lines and sum(len(l) + 1 for l in self.summary_lines) > self.summary_chars:
+            self.summary_lines.pop(0)
+
+    def _summary_message(self) -> list:
+        if not self.summary_lines:
+            return []
+        return [{"role": "system", "content": SUMMARY_PREFIX + "\n" + "\n".join(self.summary_lines)}]
+
+    def compact(self, messages: list) -> list:
+        """Return a history that fits the budget. The last turn is always kept intact."""
+        system, turns = self._split_turns(messages)
+        if not turns:
+            return system + self._summary_message()
+
+        turns = [self._strip_tool_traffic(t) for t in turns[:-1]] + [turns[-1]]
+
+        def total(turn_list):
+            return sum(self._message_chars(m) for m in system + self._summary_message()
+                       + [m for t in turn_list for m in t])
+
+        while len(turns) > self.keep_turns and total(turns) > self.max_chars:
+            self._summarize_turn(turns.pop(0))
+
+        # A few very long recent turns can still overflow; trim their older replies first
+        if total(turns) > self.max_chars:
+            limit = max(200, self.max_chars // (4 * len(turns)))
+            for turn in turns[:-1]:
+                for i, message in enumerate(turn):
+                    content = message.get("content") or ""
+                    if len(content) > limit:
+                        turn[i] = dict(message, content=content[:limit - 3].rstrip() + "...")
+
+        while len(turns) > 1 and total(turns) > self.max_chars:
+            self._summarize_turn(turns.pop(0))
+
+        compacted = system + self._summary_message() + [m for t in turns for m in t]
+        if self.estimate_tokens(compacted) * self.chars_per_token > self.max_chars:
+            LOGS.log_warning(
+                f"Conversation history (~{self.estimate_tokens(compacted)} tokens) exceeds the "
+                f"{self.max_chars // self.chars_per_token} token budget"
+            )
+        return compacted
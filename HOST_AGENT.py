@@ -0,0 +1,194 @@
+"""
+Persistent helper that runs inside the host namespaces in Docker mode.
+It is started once through nsenter and then receives commands over its stdin/stdout
+pipes, so a brightness or volume change no longer pays for entering namespaces and
+forking from the (multi-GB) Luma process every time.
+
+Protocol: every frame is a 4-byte big-endian length followed by a UTF-8 JSON body.
+- Requests are batches: [{"id": 1, "op": "sh" | "read" | "write", ...}, ...]
+- Responses are single results: {"id": 1, "rc": 0, "out": "...", "err": "..."}
+Requests within a batch run concurrently on the host; results carry the request id.
+"""
+
+import itertools
+import json
+import struct
+import subprocess
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from threading import Lock, Thread
+
+import LOGS
+
+NSENTER_PREFIX = ['nsenter', '-t', '1', '-m', '-u', '-n', '-i', '--']
+
+# Executed by the host's python3 via `python3 -u -c`; must only use the standard library
+AGENT_SOURCE = r'''
+import json, struct, subprocess, sys, threading
+out = sys.stdout.buffer
+inp = sys.stdin.buffer
+lock = threading.Lock()
+
+def reply(result):
+    data = json.dumps(result).encode()
+    with lock:
+        out.write(struct.pack(">I", len(data)) + data)
+        out.flush()
+
+def handle(req):
+    result = {"id": req["id"], "rc": 0, "out": "", "err": ""}
+    try:
+        op = req.get("op", "sh")
+        if op == "read":
+            with open(req["path"]) as f:
+                result["out"] = f.read().strip()
+        elif op == "write":
+            with open(req["path"], "w") as f:
+                f.write(req["content"])
+        elif op == "ping":
+            result["out"] = "pong"
+        else:
+            proc = subprocess.run(["sh", "-c", req["cmd"]], capture_output=True,
+                                  text=True, timeout=req.get("timeout", 10))
+            result.update(rc=proc.returncode, out=proc.stdout.strip(), err=proc.stderr.strip())
+    except subprocess.TimeoutExpired:
+        result.update(rc=-1, err="Command timed out")
+    except Exception as e:
+        result.update(rc=-1, err=str(e))
+    reply(result)
+
+while True:
+    header = inp.read(4)
+    if len(header) < 4:
+        break
+    (size,) = struct.unpack(">I", header)
+    for req in json.loads(inp.read(size)):
+        threading.Thread(target=handle, args=(req,), daemon=True).start()
+'''
+
+
+def _encode_frame(obj) -> bytes:
+    data = json.dumps(obj).encode()
+    return struct.pack('>I', len(data)) + data
+
+
+class HOST_AGENT:
+    def __init__(self, python='python3', start_timeout=5.0):
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._pending_lock = Lock()
+        self._write_lock = Lock()
+        self._proc = subprocess.Popen(
+            NSENTER_PREFIX + [python, '-u', '-c', AGENT_SOURCE],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        self._reader = Thread(target=self._read_loop, name="host-agent-reader", daemon=True)
+        self._reader.start()
+
+        # Fails fast if nsenter is not allowed or the host has no python3
+        success, output = self.request({"op": "ping"}, timeout=start_timeout)
+        if not success or output != "pong":
+            self.close()
+            raise RuntimeError(f"host agent did not start: {output}")
+
+    def _read_exact(self, size: int) -> bytes | None:
+        data = b''
+        while len(data) < size:
+            chunk = self._proc.stdout.read(size - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+    def _read_loop(self):
+        while True:
+            header = self._read_exact(4)
+            if header is None:
+                break
+            body = self._read_exact(struct.unpack('>I', header)[0])
+            if body is None:
+                break
+            # Frames are length-prefixed, so a bad one can be skipped without losing sync
+            try:
+                result = json.loads(body)
+                request_id = result["id"]
+            except (ValueError, TypeError, KeyError) as e:
+                LOGS.log_warning(f"Host agent sent an unreadable reply ({e}): {body[:200]!r}")
+                continue
+            with self._pending_lock:
+                future = self._pending.pop(request_id, None)
+            if future is not None:
+                future.set_result(result)
+        # Agent exited: fail everything still waiting
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_result({"rc": -1, "out": "", "err": "host agent exited"})
+
+    def alive(self) -> bool:
+        return self._proc.poll() is None
+
+    def submit(self, requests: list[dict]) -> list[Future]:
+        """Send a batch of requests in one frame; returns one future per request, in order."""
+        futures = []
+        with self._pending_lock:
+            for req in requests:
+                req["id"] = next(self._ids)
+                future = Future()
+                future.request_id = req["id"]
+                self._pending[req["id"]] = future
+                futures.append(future)
+        try:
+            with self._write_lock:
+                self._proc.stdin.write(_encode_frame(requests))
+                self._proc.stdin.flush()
+        except (OSError, ValueError) as e:
+            # Broken pipe, or stdin already closed
+            with self._pending_lock:
+                for req in requests:
+                    self._pending.pop(req["id"], None)
+            for future in futures:
+                if not future.done():
+                    future.set_result({"rc": -1, "out": "", "err": f"host agent unavailable: {e}"})
+        return futures
+
+    def _result(self, future: Future, timeout: float) -> tuple[bool, str]:
+        try:
+            result = future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # Nobody waits for it any more: a late reply is dropped by the reader
+            with self._pending_lock:
+                self._pending.pop(future.request_id, None)
+            return False, "Command timed out"
+        if result["rc"] == 0:
+            return True, result["out"]
+        return False, result["err"]
+
+    def request(self, req: dict, timeout: float = 10) -> tuple[bool, str]:
+        return self._result(self.submit([req])[0], timeout + 1)
+
+    def run(self, command: str, timeout: float = 10) -> tuple[bool, str]:
+        """Run a shell command on the host. Returns (success, output-or-error) like execute_on_host."""
+        return self.request({"op": "sh", "cmd": command, "timeout": timeout}, timeout)
+
+    def run_batch(self, commands: list[str], timeout: float = 10) -> list[tuple[bool, str]]:
+        """Run several shell commands in one round trip; results are in the same order."""
+        futures = self.submit([{"op": "sh", "cmd": c, "timeout": timeout} for c in commands])
+        return [self._result(f, timeout + 1) for f in futures]
+
+    def read_file(self, path: str) -> tuple[bool, str]:
+        return self.request({"op": "read", "path": path})
+
+    def write_file(self, path: str, content: str) -> bool:
+        return self.request({"op": "write", "path": path, "content": content})[0]
+
+    def close(self):
+        try:
+            self._proc.stdin.close()
+        except OSError:
+            pass
+        try:
+            self._proc.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            self._proc.kill()
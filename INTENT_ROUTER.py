@@ -0,0 +1,129 @@
+"""
+Deterministic fast path for simple system commands.
+Short, unambiguous requests like "mute" or "volume 40" are matched locally and
+answered from a template, skipping both LLM round trips of a tool turn.
+Anything that does not match a pattern completely goes to the model as usual.
+"""
+
+import json
+import re
+
+# Words that do not change the meaning of a command
+FILLER = re.compile(
+    r"\b(please|pls|luma|hey|hi|can you|could you|would you|will you|can u|could u|"
+    r"i want you to|i'd like you to|for me|now|thanks|thank you)\b"
+)
+LEVEL = r"(?P<level>\d{1,3})\s*(?:%|percent)?"
+
+# (tool name, pattern over the normalized input); patterns must match the whole input
+INTENT_PATTERNS = [
+    ("set_volume", rf"(?:set |change |turn |put )?(?:the )?(?:volume|sound)(?: level)?(?: to| at)? {LEVEL}"),
+    ("set_volume", rf"(?:set |change |turn |put )(?:the )?(?:volume|sound) (?:up |down )?to {LEVEL}"),
+    ("get_volume", r"(?:what is|whats|what's|get|show|tell me)(?: the)?(?: current)? (?:volume|sound level)"),
+    ("get_volume", r"(?:current )?volume"),
+    ("mute_volume", r"(?:mute|silence)(?: the)?(?: volume| sound| audio)?"),
+    ("unmute_volume", r"unmute(?: the)?(?: volume| sound| audio)?"),
+    ("toggle_mute", r"toggle(?: the)? mute"),
+    ("set_screen_brightness", rf"(?:set |change |turn |put )?(?:the )?(?:screen )?brightness(?: level)?(?: to| at)? {LEVEL}"),
+    ("set_screen_brightness", rf"(?:set |change |turn |put |dim )(?:the )?(?:screen|brightness|screen brightness) (?:up |down )?to {LEVEL}"),
+    ("get_screen_brightness", r"(?:what is|whats|what's|get|show|tell me)(?: the)?(?: current)? (?:screen )?brightness"),
+    ("get_screen_brightness", r"(?:current )?(?:screen )?brightness"),
+    # The tool only toggles, so plain "play"/"pause" (which may already be the state) go to the model
+    ("media_play_pause", r"(?:toggle )?(?:play pause|play/pause)|toggle(?: the)? (?:playback|music|media)"),
+    ("media_next", r"(?:skip|next)(?: to)?(?: the)?(?: next)? (?:track|song)|(?:play |go to )(?:the )?next (?:track|song)"),
+    ("media_previous", r"(?:previous|prev) (?:track|song)|(?:play |go to )?(?:the )?previous (?:track|song)|go back a (?:track|song)"),
+    ("lock_screen", r"lock(?: the)?(?: screen| computer| pc| session)?"),
+]
+
+# Reply templates; {level} is the requested value and {result} the tool's return value
+TEMPLATES = {
+    "set_volume": ("Volume set to {level}%.", "Sorry, I couldn't change the volume."),
+    "get_volume": ("The volume is at {result}%.", "Sorry, I couldn't read the volume."),
+    "mute_volume": ("Muted.", "Sorry, I couldn't mute the volume."),
+    "unmute_volume": ("Unmuted.", "Sorry, I couldn't unmute the volume."),
+    "toggle_mute": ("Done.", "Sorry, I couldn't toggle mute."),
+    "set_screen_brightness": ("Brightness set to {level}%.", "Sorry, I couldn't change the brightness."),
+    "get_screen_brightness": ("The screen brightness is at {result}%.", "Sorry, I couldn't read the screen brightness."),
+    "media_play_pause": ("Done.", "Sorry, I couldn't find a media player."),
+    "media_next": ("Skipping to the next track.", "Sorry, I couldn't skip the track."),
+    "media_previous": ("Going back to the previous track.", "Sorry, I couldn't go back a track."),
+    "lock_screen": ("Locking the screen.", "Sorry, I couldn't lock the screen."),
+}
+
+# Spoken while a tool call from the LLM runs, when the model itself said nothing before calling it
+ACKNOWLEDGEMENTS = {
+    "set_screen_brightness": "Adjusting the brightness.",
+    "get_screen_brightness": "Checking the brightness.",
+    "set_volume": "Adjusting the volume.",
+    "get_volume": "Checking the volume.",
+    "mute_volume": "Muting.",
+    "unmute_volume": "Unmuting.",
+    "toggle_mute": "Toggling mute.",
+    "media_play_pause": "Sure.",
+    "media_next": "Skipping ahead.",
+    "media_previous": "Going back.",
+    "lock_screen": "Locking the screen.",
+    "suspend": "Suspending.",
+    "reboot": "Rebooting.",
+    "shutdown": "Shutting down.",
+}
+DEFAULT_ACKNOWLEDGEMENT = "One moment."
+
+
+def acknowledgement(tool_calls: list) -> str:
+    """Short phrase announcing the first tool call of a turn."""
+    return ACKNOWLEDGEMENTS.get(tool_calls[0]["function"]["name"], DEFAULT_ACKNOWLEDGEMENT)
+
+
+class INTENT_ROUTER:
+    def __init__(self, tools: list, available_functions: dict):
+        # Only route to tools that are both declared to the model and callable
+        schemas = {t["function"]["name"]: t["function"] for t in tools}
+        self.patterns = []
+        for name, pattern in INTENT_PATTERNS:
+            if name not in schemas or name not in available_functions or name not in TEMPLATES:
+                continue
+            required = set(schemas[name]["parameters"].get("required", []))
+            groups = set(re.compile(pattern).groupindex)
+            if not required <= groups:
+                continue
+            self.patterns.append((name, re.compile(rf"^(?:{pattern})$")))
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        text = text.lower().strip()
+        text = FILLER.sub(" ", text)
+        text = re.sub(r"[!?.,]+", " ", text)
+        return " ".join(text.split())
+
+    def match(self, text: str) -> dict | None:
+        """Return a tool call dict ({"function": {"name", "arguments"}}) for a confident match."""
+        normalized = self.normalize(text)
+        if not normalized or len(normalized) > 60:
+            return None
+        for name, pattern in self.patterns:
+            found = pattern.match(normalized)
+            if found:
+                arguments = {}
+                if "level" in pattern.groupindex:
+                    level = int(found.group("level"))
+                    if level > 100:
+                        return None
+                    arguments["level"] = level
+                return {"function": {"name": name, "arguments": arguments}}
+        return None
+
+    @staticmethod
+    def respond(tool_call: dict, result_json: str) -> str:
+        """Render the spoken reply for a routed tool call from its JSON result."""
+        name = tool_call["function"]["name"]
+        success_template, failure_template = TEMPLATES[name]
+        try:
+            result = json.loads(result_json)
+        except ValueError:
+            return failure_template
+        if "error" in result or result.get("status") == "failed":
+            return failure_template
+        if "{result}" in success_template and result.get("result") is None:
+            return failure_template
+        return success_template.format(result=result.get("result"), **tool_call["function"]["arguments"])
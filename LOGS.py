@@ -1,23 +1,138 @@
+"""
+Leveled logging through a background writer.
+log_* calls only put a record on a queue; a listener thread writes it to stdout (colored
+on a terminal, plain otherwise) and optionally to a rotating file, so logging from the
+tool, synthesis or playback path never waits on a write to the terminal the response
+is being streamed to. Levels and outputs come from [LOGGING] in config.conf via configure().
+
+Debug calls return after one flag check when debug logging is off. Pass arguments
+separately (log_debug("metrics: %s", metrics)) to also skip formatting the message,
+or check LOGS.debug_enabled before building an expensive one.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+
 from colored import fg, attr
 
-def log_info(message: str) -> None:
-    print(fg("cyan") + "[INFO] " + attr("reset") + message)
+SUCCESS = 25
+logging.addLevelName(SUCCESS, "SUCCESS")
+
+COLORS = {
+    logging.DEBUG: "blue",
+    logging.INFO: "cyan",
+    SUCCESS: "green",
+    logging.WARNING: "yellow",
+    logging.ERROR: "red",
+    logging.CRITICAL: "magenta",
+}
+
+debug_enabled = False
+
+_logger = logging.getLogger("luma")
+_logger.propagate = False
+_logger.setLevel(logging.INFO)
+_queue = queue.Queue()
+_logger.addHandler(logging.handlers.QueueHandler(_queue))
+_listener = None
+
+
+class LOG_FORMATTER(logging.Formatter):
+    """"[LEVEL] message", with the label colored for a terminal and a timestamp for files."""
+
+    def __init__(self, color: bool = True, timestamps: bool = False):
+        super().__init__()
+        self.color = color
+        self.timestamps = timestamps
+
+    def format(self, record):
+        label = f"[{getattr(record, 'label', record.levelname)}] "
+        if self.color:
+            label = fg(getattr(record, "color", None) or COLORS.get(record.levelno, "white")) + label + attr("reset")
+        if self.timestamps:
+            label = self.formatTime(record, "%Y-%m-%d %H:%M:%S") + " " + label
+        return label + record.getMessage()
+
 
+def configure(level: str | int = "INFO", file: str | None = None, max_bytes: int = 5 * 2 ** 20,
+              backups: int = 3, color: bool | None = None):
+    """Set the level and outputs. color=None colors stdout only when it is a terminal;
+    a file is rotated at max_bytes (0 never rotates)."""
+    global _listener, debug_enabled
+    if isinstance(level, str):
+        name = level.strip().upper()
+        level = logging.getLevelName(name)
+        if not isinstance(level, int):
+            log_warning(f"Unknown log level {name!r}, using INFO")
+            level = logging.INFO
+    if color is None:
+        color = sys.stdout.isatty()
 
-def log_warning(message: str) -> None:
-    print(fg("yellow") + "[WARNING] " + attr("reset") + message)
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(LOG_FORMATTER(color=color))
+    handlers = [console]
+    if file:
+        try:
+            handler = logging.handlers.RotatingFileHandler(file, maxBytes=max_bytes, backupCount=backups,
+                                                           encoding="utf-8", delay=True)
+        except OSError as e:
+            log_warning(f"Log file disabled: {e}")
+        else:
+            handler.setFormatter(LOG_FORMATTER(color=False, timestamps=True))
+            handlers.append(handler)
 
-def log_error(message: str) -> None:
-    print(fg("red") + "[ERROR] " + attr("reset") + message)
+    # Records logged while the outputs are swapped wait in the queue for the new listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+    _logger.setLevel(level)
+    debug_enabled = level <= logging.DEBUG
+    _listener = logging.handlers.QueueListener(_queue, *handlers)
+    _listener.start()
 
-def log_debug(message: str) -> None:
-    print(fg("blue") + "[DEBUG] " + attr("reset") + message)
 
-def log_success(message: str) -> None:
-    print(fg("green") + "[SUCCESS] " + attr("reset") + message)
+def flush() -> None:
+    """Wait until everything logged so far has been written (e.g. before showing a prompt)."""
+    if _listener is not None:
+        _queue.join()
 
-def log_critical(message: str) -> None:
-    print(fg("magenta") + "[CRITICAL] " + attr("reset") + message)
+
+def shutdown() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def log_info(message: str, *args) -> None:
+    _logger.info(message, *args)
+
+def log_warning(message: str, *args) -> None:
+    _logger.warning(message, *args)
+
+def log_error(message: str, *args) -> None:
+    _logger.error(message, *args)
+
+def log_debug(message: str, *args) -> None:
+    if debug_enabled:
+        _logger.debug(message, *args)
+
+def log_success(message: str, *args) -> None:
+    _logger.log(SUCCESS, message, *args)
+
+def log_critical(message: str, *args) -> None:
+    _logger.critical(message, *args)
 
 def log_custom(level: str, message: str, color: str) -> None:
-    print(fg(color) + f"[{level}] " + attr("reset") + message)
\ No newline at end of file
+    _logger.info(message, extra={"label": level, "color": color})
+
+
+# Usable before configure(): INFO and up to stdout
+configure()
+atexit.register(shutdown)
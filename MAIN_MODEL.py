@@ -1,9 +1,18 @@
-import requests
+import asyncio
+import contextvars
 import json
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 import LOGS
+import TRACING
+from OLLAMA_CLIENT import OLLAMA_CLIENT, STREAM_STATS
+from HISTORY import HISTORY_MANAGER
+from INTENT_ROUTER import INTENT_ROUTER, acknowledgement
 from SYSTEM_CALLS import *
 
-OLLAMA_API_URL = "http://localhost:11434/api/chat"
+OLLAMA_CHAT_PATH = "/api/chat"
+OLLAMA_GENERATE_PATH = "/api/generate"
 
 SYSTEM_PROMPT = """You are Luma, a helpful AI assistant that can control system functions.
 You have access to tools for controlling screen brightness, volume, media playback, and power management.
@@ -16,9 +25,72 @@ IMPORTANT: Only use tools when the user explicitly asks you to perform a system
 For normal conversation, greetings, questions, or general chat, respond naturally WITHOUT using any tools.
 Do not call tools unless the user's request clearly requires a system action."""
 
+# Ollama runtime options configurable in [INFERENCE]: config key -> (option name, type)
+INFERENCE_OPTIONS = {
+    "TEMPERATURE": ("temperature", float),
+    "TOP_P": ("top_p", float),
+    "NUM_CTX": ("num_ctx", int),
+    "NUM_PREDICT": ("num_predict", int),
+    "NUM_THREAD": ("num_thread", int),
+    "NUM_GPU": ("num_gpu", int),
+}
+
+# Tools touching the same resource are executed in order; different resources run concurrently
+TOOL_RESOURCES = {
+    "set_screen_brightness": "brightness",
+    "get_screen_brightness": "brightness",
+    "set_volume": "volume",
+    "get_volume": "volume",
+    "mute_volume": "volume",
+    "unmute_volume": "volume",
+    "toggle_mute": "volume",
+    "media_play_pause": "media",
+    "media_next": "media",
+    "media_previous": "media",
+    "lock_screen": "power",
+    "suspend": "power",
+    "reboot": "power",
+    "shutdown": "power",
+}
+# resource -> future of a timed-out tool call still running. Module level: the resources are
+# system-wide and server sessions share one tool executor, so every session must see them
+_busy_resources = {}
+
+class STREAM_RESULT:
+    """What one streamed completion produced besides the text chunks it yielded."""
+
+    def __init__(self):
+        self.parts = []  # content chunks, joined once at the end instead of concatenated per token
+        self.tool_calls = []
+        self.done_reason = None
+        self.stats = STREAM_STATS()  # timing of the stream (first byte/chunk, gaps between chunks)
+
+    @property
+    def content(self) -> str:
+        return "".join(self.parts)
+
+
 class MAIN_MODEL:
-    def __init__(self, model_name="llama3.2", temperature=0.7, max_tokens=512, use_tools=False):
+    def __init__(self, model_name="llama3.2", temperature=0.7, max_tokens=512, use_tools=False, client=None, history=None,
+                 tool_workers=4, tool_timeout=12.0, fast_path=True, keep_alive=None, ready_timeout=10.0,
+                 options=None, routing_options=None, acknowledge_tools=True, tool_executor=None):
         self.model_name = model_name
+        # Speak something right away when the LLM calls a tool, instead of silence until the final answer
+        self.acknowledge_tools = acknowledge_tools
+        self.ready_timeout = ready_timeout
+        # How long Ollama keeps the model loaded after a request ("30m", "-1" = forever, None = server default)
+        self.keep_alive = keep_alive
+        # Sent as "options" with every request; routing_options are layered on top for the
+        # first request of a tool-mode turn (the one that decides whether to call a tool)
+        self.options = {"temperature": temperature, "num_predict": max_tokens}
+        self.options.update(options or {})
+        self.routing_options = dict(routing_options or {})
+        self.tool_timeout = tool_timeout
+        # Server sessions pass one shared pool instead of starting tool_workers threads each
+        self.tool_executor = tool_executor or ThreadPoolExecutor(max_workers=tool_workers, thread_name_prefix="tool")
+        self.stream_stats = []  # STREAM_STATS of each request made by the last generate_response()
+        self.client = client if client is not None else OLLAMA_CLIENT()
+        self.history = history if history is not None else HISTORY_MANAGER()
         self.temperature = temperature
         self.max_tokens = max_tokens
         self.use_tools = use_tools
@@ -232,6 +304,9 @@ class MAIN_MODEL:
             "shutdown": shutdown,
         }
 
+        # Simple commands ("mute", "volume 40") skip the LLM entirely
+        self.router = INTENT_ROUTER(self.tools, self.available_functions) if use_tools and fast_path else None
+
     def _execute_tool_call(self, tool_call: dict) -> str:
         """Execute a tool call and return the result as a string."""
         function_name = tool_call["function"]["name"]
@@ -271,111 +346,229 @@ class MAIN_MODEL:
             LOGS.log_error(f"Tool execution error: {e}")
             return json.dumps({"error": str(e)})
 
-    def _call_api(self, payload: dict, stream: bool = False):
-        """Make a request to the Ollama API."""
-        payload["stream"] = stream
-        response = requests.post(OLLAMA_API_URL, json=payload, stream=stream)
-        response.raise_for_status()
+    async def _run_tool_call(self, tool_call: dict) -> str:
+        """Execute one tool call on the tool executor, giving up after tool_timeout seconds.
+        A thread cannot be stopped, so a call that times out keeps its resource busy until
+        it really finishes; later calls on that resource wait for it (up to tool_timeout)
+        instead of running alongside it."""
+        loop = asyncio.get_running_loop()
+        function_name = tool_call["function"]["name"]
+        resource = TOOL_RESOURCES.get(function_name, function_name)
+        with TRACING.span("tool", tool=function_name) as span:
+            running = _busy_resources.get(resource)
+            if running is not None:
+                await asyncio.wait({running}, timeout=self.tool_timeout)
+                if not running.done():
+                    span.set(error="resource busy")
+                    LOGS.log_error(f"Tool {function_name} skipped: an earlier {resource} call is still running")
+                    return json.dumps({"error": f"{function_name} not run: an earlier {resource} call is still running"})
+                _busy_resources.pop(resource, None)
+
+            # The copied context keeps the turn id on records made on the tool thread
+            future = loop.run_in_executor(self.tool_executor, contextvars.copy_context().run,
+                                          self._execute_tool_call, tool_call)
+            # asyncio.wait leaves the future running on timeout, so it can still be waited for
+            try:
+                await asyncio.wait({future}, timeout=self.tool_timeout)
+            except asyncio.CancelledError:
+                # Interrupted turn: the thread keeps going all the same
+                if not future.done():
+                    _busy_resources[resource] = future
+                raise
+            if future.done():
+                return future.result()
+            _busy_resources[resource] = future
+            span.set(error="timeout")
+        TRACING.count("tool_timeouts_total", tool=function_name)
+        LOGS.log_error(f"Tool {function_name} timed out after {self.tool_timeout}s")
+        return json.dumps({"error": f"{function_name} timed out after {self.tool_timeout}s"})
+
+    async def _execute_tool_calls(self, tool_calls: list) -> list:
+        """Execute tool calls concurrently across resources, in order within a resource.
+        Results are returned in the original call order."""
+        results = [None] * len(tool_calls)
+        chains = {}
+        for index, tool_call in enumerate(tool_calls):
+            name = tool_call["function"]["name"]
+            chains.setdefault(TOOL_RESOURCES.get(name, name), []).append(index)
+
+        async def run_chain(indices):
+            for index in indices:
+                results[index] = await self._run_tool_call(tool_calls[index])
+
+        await asyncio.gather(*(run_chain(indices) for indices in chains.values()))
+        return results
+
+    async def _fast_path_response(self, tool_call: dict) -> str:
+        """Run a routed tool call and record the exchange like a regular tool turn."""
+        result = await self._run_tool_call(tool_call)
+        response = self.router.respond(tool_call, result)
+        self.messages.append({"role": "assistant", "content": "", "tool_calls": [tool_call]})
+        self.messages.append({"role": "tool", "content": result})
+        self.messages.append({"role": "assistant", "content": response})
         return response
 
-    def generate_response(self, prompt):
-        """Generate a response, handling tool calls if enabled."""
-        # Add user message to history
-        self.messages.append({"role": "user", "content": prompt})
-        
-        # Build request payload
+    @staticmethod
+    def inference_config(config) -> dict:
+        """Constructor arguments (options, routing_options, keep_alive) from the [INFERENCE] section.
+        Empty values are left out so Ollama uses the model's own defaults."""
+        options = {}
+        for key, (name, cast) in INFERENCE_OPTIONS.items():
+            value = config.get('INFERENCE', key, fallback='').strip()
+            options[name] = cast(value) if value else None
+        routing_options = {}
+        routing_predict = config.get('INFERENCE', 'ROUTING_NUM_PREDICT', fallback='').strip()
+        if routing_predict:
+            routing_options["num_predict"] = int(routing_predict)
+        return {
+            "options": options,
+            "routing_options": routing_options,
+            "keep_alive": config.get('INFERENCE', 'KEEP_ALIVE', fallback='').strip() or None,
+        }
+
+    def _request_options(self, overrides=None, routing=False) -> dict:
+        options = dict(self.options)
+        if routing:
+            options.update(self.routing_options)
+        options.update(overrides or {})
+        return {name: value for name, value in options.items() if value is not None}
+
+    def _build_payload(self, overrides=None, routing=False) -> dict:
+        overrides = dict(overrides or {})
+        keep_alive = overrides.pop("keep_alive", self.keep_alive)
         payload = {
             "model": self.model_name,
             "messages": self.messages,
+            "options": self._request_options(overrides, routing),
         }
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
         if self.use_tools:
             payload["tools"] = self.tools
-        
-        if self.use_tools:
-            # Stream the response and collect tool calls if any
-            response = self._call_api(payload, stream=True)
-            
-            full_response = ""
-            tool_calls = []
-            
-            for line in response.iter_lines():
-                if line:
-                    chunk = json.loads(line)
-                    message = chunk.get("message", {})
-                    
-                    # Collect content
-                    content = message.get("content", "")
-                    if content:
-                        full_response += content
-                        yield content
-                    
-                    # Collect tool calls from the stream
-                    if message.get("tool_calls"):
-                        tool_calls.extend(message.get("tool_calls", []))
-            
-            # If there were tool calls, execute them and get final response
-            if tool_calls:
-                # Add assistant message with tool calls to history
-                self.messages.append({
-                    "role": "assistant",
-                    "content": full_response,
-                    "tool_calls": tool_calls
-                })
-                
-                # Execute each tool call
-                for tool_call in tool_calls:
-                    result = self._execute_tool_call(tool_call)
-                    
-                    # Add tool response to messages
-                    self.messages.append({
-                        "role": "tool",
-                        "content": result,
-                    })
-                
-                # Get final response after tool execution (streaming)
-                payload["messages"] = self.messages
-                response = self._call_api(payload, stream=True)
-                
-                final_response = ""
-                for line in response.iter_lines():
-                    if line:
-                        chunk = json.loads(line)
-                        content = chunk.get("message", {}).get("content", "")
-                        if content:
-                            final_response += content
-                            yield content
-                
-                # Add final response to history
-                self.messages.append({"role": "assistant", "content": final_response})
-            else:
-                # No tool calls - just add the response to history
-                self.messages.append({"role": "assistant", "content": full_response})
-            return
-        
-        # No tools enabled - stream the response directly
-        response = self._call_api(payload, stream=True)
-        
-        full_response = ""
-        for line in response.iter_lines():
-            if line:
-                chunk = json.loads(line)
-                content = chunk.get("message", {}).get("content", "")
+        return payload
+
+    def preload(self):
+        """Ask Ollama to load the model now, so the first turn does not pay for the cold load.
+        A generate request without a prompt only loads the model. The options are sent too:
+        a different num_ctx/num_gpu/num_thread on the first turn would reload it."""
+        payload = {"model": self.model_name, "stream": False, "options": self._request_options()}
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        self.client.post(OLLAMA_GENERATE_PATH, payload)
+
+    async def _ensure_ready(self) -> bool:
+        """Check that Ollama answers before sending a turn; only probes when it has not answered recently."""
+        if self.client.ready:
+            return True
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.client.wait_until_ready, self.ready_timeout)
+
+    def _stream_api(self, payload: dict, stats: STREAM_STATS | None = None):
+        """Stream a chat request from the Ollama API, yielding decoded chunks."""
+        return self.client.stream_chat(OLLAMA_CHAT_PATH, payload, stats)
+
+    async def _stream_content(self, payload: dict, result: STREAM_RESULT):
+        """Yield the content of a streamed completion, collecting it and any tool calls into result."""
+        start = time.perf_counter()
+        first = True
+        self.stream_stats.append(result.stats)
+        with TRACING.span("llm_request", model=self.model_name, tools="tools" in payload) as span:
+            async for chunk in self._stream_api(payload, result.stats):
+                message = chunk.get("message", {})
+                content = message.get("content")
+                if first and (content or message.get("tool_calls")):
+                    first = False
+                    TRACING.observe("llm_first_token_seconds", time.perf_counter() - start)
+                    TRACING.event("first_token", ms=round((time.perf_counter() - start) * 1000, 3))
                 if content:
-                    full_response += content
+                    result.parts.append(content)
                     yield content
+                if message.get("tool_calls"):
+                    result.tool_calls.extend(message["tool_calls"])
+                if chunk.get("done"):
+                    result.done_reason = chunk.get("done_reason")
+                    span.set(eval_count=chunk.get("eval_count"), done_reason=result.done_reason)
+            if TRACING.enabled:
+                span.set(stream=result.stats.summary())
+
+    async def generate_response(self, prompt, options=None):
+        """Generate a response, handling tool calls if enabled.
+        options overrides the inference options (and "keep_alive") for this turn only."""
+        self.stream_stats = []
+        # Add user message to history and keep the history within its token budget
+        self.messages.append({"role": "user", "content": prompt})
+        self.messages = self.history.compact(self.messages)
+
+        if self.router is not None:
+            tool_call = self.router.match(prompt)
+            if tool_call is not None:
+                yield await self._fast_path_response(tool_call)
+                return
+
+        if not await self._ensure_ready():
+            LOGS.log_error(f"Ollama is not reachable at {self.client.host}")
+            self.messages.pop()  # the unanswered user message
+            return
         
-        # Add assistant response to history
-        self.messages.append({"role": "assistant", "content": full_response})
+        # Build request payload
+        payload = self._build_payload(options, routing=self.use_tools)
+
+        first = STREAM_RESULT()
+        async for content in self._stream_content(payload, first):
+            yield content
+
+        # If there were tool calls, execute them and get final response
+        if first.tool_calls:
+            if self.acknowledge_tools:
+                # Spoken while the tools and the second request run. The model's own preamble is
+                # already out; the newline ends it as a segment so TTS does not wait for more text
+                if re.search(r"\w", first.content):
+                    yield "\n"
+                else:
+                    yield acknowledgement(first.tool_calls) + "\n"
+
+            # Add assistant message with tool calls to history
+            self.messages.append({
+                "role": "assistant",
+                "content": first.content,
+                "tool_calls": first.tool_calls
+            })
+
+            # Execute the tool calls; they block on subprocesses, so keep them off the event loop
+            for result in await self._execute_tool_calls(first.tool_calls):
+                # Add tool response to messages
+                self.messages.append({
+                    "role": "tool",
+                    "content": result,
+                })
+
+            # Get final response after tool execution (streaming)
+            final = STREAM_RESULT()
+            async for content in self._stream_content(self._build_payload(options), final):
+                yield content
+            self.messages.append({"role": "assistant", "content": final.content})
+        else:
+            # No tool calls (or tools disabled) - just add the response to history
+            self.messages.append({"role": "assistant", "content": first.content})
 
     def clear_history(self):
         """Clear conversation history, keeping system prompt if tools are enabled."""
+        self.history.reset()
         if self.use_tools:
             self.messages = [{"role": "system", "content": SYSTEM_PROMPT}]
         else:
             self.messages = []
 
 
-if __name__ == "__main__":
+async def _print_response(model, prompt):
+    print(f"User: {prompt}")
+    print("AI: ", end='', flush=True)
+    async for chunk in model.generate_response(prompt):
+        print(chunk, end='', flush=True)
+    print("\n")
+
+
+async def _demo():
     # Test with function calling
     model = MAIN_MODEL(model_name="llama3.2", temperature=0.5, max_tokens=256, use_tools=True)
     
@@ -383,17 +576,12 @@ if __name__ == "__main__":
     print("-" * 40)
     
     # Test a simple query that should trigger a tool call
-    prompt = "What is the current screen brightness?"
-    print(f"User: {prompt}")
-    print("AI: ", end='', flush=True)
-    for chunk in model.generate_response(prompt):
-        print(chunk, end='', flush=True)
-    print("\n")
+    await _print_response(model, "What is the current screen brightness?")
     
     # Test setting brightness
-    prompt = "Set the screen brightness to 50%"
-    print(f"User: {prompt}")
-    print("AI: ", end='', flush=True)
-    for chunk in model.generate_response(prompt):
-        print(chunk, end='', flush=True)
-    print("\n")
\ No newline at end of file
+    await _print_response(model, "Set the screen brightness to 50%")
+    await model.client.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(_demo())
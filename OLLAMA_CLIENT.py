@@ -0,0 +1,261 @@
+"""
+Pooled HTTP client for the Ollama API.
+One keep-alive session is shared by every request so back-to-back calls
+(e.g. a tool call followed by the final answer) reuse the same connection.
+Streaming chat goes through an asyncio client with the same pool and timeout settings.
+Readiness is probed in-process (GET /api/tags) and the model inventory it returns is cached.
+Streamed NDJSON is split from raw socket reads and decoded with orjson when it is installed.
+"""
+
+import asyncio
+import json
+import time
+from threading import Lock
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import LOGS
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+DEFAULT_HOST = "http://localhost:11434"
+TAGS_PATH = "/api/tags"
+
+
+def loads(data):
+    """Decode one JSON document from bytes (orjson if available, else the stdlib)."""
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+class NDJSON_DECODER:
+    """Splits a byte stream into lines and decodes them; an incomplete last line waits for the next read."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes) -> list:
+        self._buffer += data
+        end = self._buffer.rfind(b"\n")
+        if end < 0:
+            return []
+        lines = self._buffer[:end].split(b"\n")
+        del self._buffer[:end + 1]
+        return [loads(line) for line in lines if line.strip()]
+
+    def flush(self) -> list:
+        """Decode whatever is left once the stream has ended."""
+        rest, self._buffer = self._buffer, bytearray()
+        return [loads(rest)] if rest.strip() else []
+
+
+class STREAM_STATS:
+    """Timing of one streamed response: time to first byte/object and the gaps between objects."""
+
+    def __init__(self):
+        self._start = time.perf_counter()
+        self._last = None
+        self.first_byte_s = None
+        self.first_chunk_s = None
+        self.chunks = 0
+        self.bytes = 0
+        self.gaps = []
+
+    def read(self, nbytes: int):
+        if self.first_byte_s is None:
+            self.first_byte_s = time.perf_counter() - self._start
+        self.bytes += nbytes
+
+    def chunk(self):
+        now = time.perf_counter()
+        if self._last is None:
+            self.first_chunk_s = now - self._start
+        else:
+            self.gaps.append(now - self._last)
+        self._last = now
+        self.chunks += 1
+
+    def summary(self) -> dict:
+        total = (self._last or time.perf_counter()) - self._start
+        return {
+            "chunks": self.chunks,
+            "bytes": self.bytes,
+            "first_byte_s": self.first_byte_s,
+            "first_chunk_s": self.first_chunk_s,
+            "total_s": total,
+            "mean_gap_s": sum(self.gaps) / len(self.gaps) if self.gaps else None,
+            "max_gap_s": max(self.gaps, default=None),
+        }
+
+
+class OLLAMA_CLIENT:
+    def __init__(self, host=DEFAULT_HOST, connect_timeout=3.0, read_timeout=120.0,
+                 retries=3, backoff=0.5, pool_size=4, probe_timeout=1.0, models_ttl=30.0):
+        self.host = host.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.probe_timeout = probe_timeout
+        self.models_ttl = models_ttl
+        self._async_client = None
+        # Last time Ollama answered (probe or chat) and the model names it reported
+        self._ready_at = None
+        self._models = None
+        self._models_at = 0.0
+        self._probe_lock = Lock()
+
+        # Only retry failures to connect; a request that reached Ollama may have started generating
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=0,
+            status=0,
+            other=0,
+            backoff_factor=backoff,
+            allowed_methods=None,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # A probe must answer quickly, not retry with backoff: the longer prefix wins for /api/tags
+        self.session.mount(self.url(TAGS_PATH), HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=0))
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a client from the [OLLAMA] section of config.conf."""
+        return cls(
+            host=config.get('OLLAMA', 'HOST', fallback=DEFAULT_HOST),
+            connect_timeout=config.getfloat('OLLAMA', 'CONNECT_TIMEOUT', fallback=3.0),
+            read_timeout=config.getfloat('OLLAMA', 'READ_TIMEOUT', fallback=120.0),
+            retries=config.getint('OLLAMA', 'RETRIES', fallback=3),
+            backoff=config.getfloat('OLLAMA', 'BACKOFF', fallback=0.5),
+            pool_size=config.getint('OLLAMA', 'POOL_SIZE', fallback=4),
+            probe_timeout=config.getfloat('OLLAMA', 'PROBE_TIMEOUT', fallback=1.0),
+            models_ttl=config.getfloat('OLLAMA', 'MODELS_TTL', fallback=30.0),
+        )
+
+    def url(self, path: str) -> str:
+        return f"{self.host}/{path.lstrip('/')}"
+
+    def post(self, path: str, payload: dict, stream: bool = False):
+        """POST JSON to the API and raise on HTTP errors."""
+        try:
+            response = self.session.post(self.url(path), json=payload, stream=stream, timeout=self.timeout)
+        except requests.exceptions.ConnectionError as e:
+            LOGS.log_error(f"Cannot reach Ollama at {self.host}: {e}")
+            raise
+        response.raise_for_status()
+        return response
+
+    def get(self, path: str):
+        response = self.session.get(self.url(path), timeout=self.timeout)
+        response.raise_for_status()
+        return response
+
+    def _probe(self) -> list[str] | None:
+        """One GET /api/tags; returns the model names, or None if Ollama does not answer."""
+        try:
+            response = self.session.get(self.url(TAGS_PATH), timeout=self.probe_timeout)
+            response.raise_for_status()
+            models = [m.get("name", "") for m in response.json().get("models", [])]
+        except (requests.exceptions.RequestException, ValueError):
+            self._ready_at = None
+            return None
+        now = time.monotonic()
+        self._ready_at = now
+        self._models, self._models_at = models, now
+        return models
+
+    @property
+    def ready(self) -> bool:
+        """Whether Ollama answered within the last models_ttl seconds (no request is made)."""
+        return self._ready_at is not None and time.monotonic() - self._ready_at < self.models_ttl
+
+    def is_ready(self) -> bool:
+        """Probe Ollama unless it answered recently."""
+        if self.ready:
+            return True
+        with self._probe_lock:
+            return self.ready or self._probe() is not None
+
+    def wait_until_ready(self, timeout=30.0, initial_delay=0.05, max_delay=1.0) -> bool:
+        """Poll with exponential backoff until Ollama answers or the timeout expires."""
+        deadline = time.monotonic() + timeout
+        delay = initial_delay
+        while not self.is_ready():
+            if time.monotonic() + delay > deadline:
+                return False
+            time.sleep(delay)
+            delay = min(delay * 2, max_delay)
+        return True
+
+    def list_models(self, max_age=None) -> list[str]:
+        """Names of the locally available models, cached for models_ttl seconds."""
+        max_age = self.models_ttl if max_age is None else max_age
+        with self._probe_lock:
+            if self._models is None or time.monotonic() - self._models_at > max_age:
+                if self._probe() is None:
+                    return []
+            return list(self._models)
+
+    def has_model(self, name: str) -> bool:
+        """True if the model is available; "llama3.2" matches "llama3.2:latest"."""
+        wanted = name if ":" in name else f"{name}:latest"
+        return any(model in (name, wanted) for model in self.list_models())
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        # Created lazily so it binds to the event loop that actually runs the pipeline
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                base_url=self.host,
+                timeout=httpx.Timeout(self.timeout[1], connect=self.timeout[0]),
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+            )
+        return self._async_client
+
+    async def stream_chat(self, path: str, payload: dict, stats: STREAM_STATS | None = None):
+        """POST a streaming request and yield each decoded NDJSON object as it arrives.
+        Pass a STREAM_STATS to get the timing of this stream; the client keeps none, since
+        concurrent sessions share it."""
+        client = self._get_async_client()
+        payload["stream"] = True
+        if stats is None:
+            stats = STREAM_STATS()
+        for attempt in range(self.retries + 1):
+            try:
+                decoder = NDJSON_DECODER()
+                async with client.stream("POST", path, json=payload) as response:
+                    response.raise_for_status()
+                    self._ready_at = time.monotonic()
+                    # Whole socket reads (up to 64 KiB) rather than lines; one read often holds several objects
+                    async for data in response.aiter_bytes():
+                        stats.read(len(data))
+                        for obj in decoder.feed(data):
+                            stats.chunk()
+                            yield obj
+                    for obj in decoder.flush():
+                        stats.chunk()
+                        yield obj
+                return
+            except httpx.ConnectError as e:
+                self._ready_at = None
+                if attempt >= self.retries:
+                    LOGS.log_error(f"Cannot reach Ollama at {self.host}: {e}")
+                    raise
+                await asyncio.sleep(self.backoff * (2 ** attempt))
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+    def close(self):
+        self.session.close()
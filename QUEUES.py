@@ -0,0 +1,96 @@
+"""
+Bounded asyncio queues for the response pipeline, with depth metrics.
+The audio queue is bounded by seconds of audio instead of item count: Kokoro chunks
+range from a fraction of a second to many seconds, and anything synthesized ahead of
+playback is wasted when the user interrupts.
+"""
+
+import asyncio
+from collections import deque
+
+import TRACING
+
+DEPTH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+SECONDS_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0)
+
+
+class METERED_QUEUE(asyncio.Queue):
+    """asyncio.Queue that records its peak depth and how long producers waited for space."""
+
+    def __init__(self, maxsize=0, name: str = "queue"):
+        super().__init__(maxsize)
+        self.name = name
+        self.puts = 0
+        self.peak = 0
+        self.put_wait = 0.0
+
+    async def put(self, item):
+        if self.full():
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            await super().put(item)
+            self.put_wait += loop.time() - start
+        else:
+            self.put_nowait(item)
+
+    def put_nowait(self, item):
+        super().put_nowait(item)
+        self.puts += 1
+        self.peak = max(self.peak, self.qsize())
+        TRACING.observe("queue_depth_items", self.qsize(), DEPTH_BUCKETS, queue=self.name)
+
+    def metrics(self) -> dict:
+        return {"items": self.puts, "peak_items": self.peak, "put_wait_s": round(self.put_wait, 3)}
+
+
+class AUDIO_QUEUE:
+    """Queue of audio chunks holding at most max_seconds of audio.
+    A chunk is always accepted into an empty queue, so one long chunk cannot deadlock it.
+    None (end of stream) takes no space."""
+
+    def __init__(self, max_seconds: float, sample_rate: int):
+        self.sample_rate = sample_rate
+        self.max_frames = int(max_seconds * sample_rate)
+        self._items = deque()
+        self._frames = 0
+        self._cond = asyncio.Condition()
+        self.puts = 0
+        self.peak_frames = 0
+        self.put_wait = 0.0
+
+    def qsize(self) -> int:
+        return len(self._items)
+
+    def seconds(self) -> float:
+        """Seconds of audio currently queued."""
+        return self._frames / self.sample_rate
+
+    async def put(self, audio):
+        frames = 0 if audio is None else len(audio)
+        async with self._cond:
+            if self._items and self._frames + frames > self.max_frames:
+                loop = asyncio.get_running_loop()
+                start = loop.time()
+                await self._cond.wait_for(lambda: not self._items or self._frames + frames <= self.max_frames)
+                self.put_wait += loop.time() - start
+            self._items.append((audio, frames))
+            self._frames += frames
+            self.puts += 1
+            self.peak_frames = max(self.peak_frames, self._frames)
+            TRACING.observe("queue_depth_seconds", self.seconds(), SECONDS_BUCKETS, queue="audio")
+            self._cond.notify_all()
+
+    async def get(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._items)
+            audio, frames = self._items.popleft()
+            self._frames -= frames
+            self._cond.notify_all()
+            return audio
+
+    def metrics(self) -> dict:
+        return {
+            "items": self.puts,
+            "peak_seconds": round(self.peak_frames / self.sample_rate, 3),
+            "put_wait_s": round(self.put_wait, 3),
+        }
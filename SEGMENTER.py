@@ -0,0 +1,164 @@
+"""
+Incremental sentence segmenter for streaming TTS.
+Text arrives token by token; each character is examined once and finished
+segments are handed out as soon as their boundary is certain.
+- "3.5", "e.g.", "Dr.", initials ("J. Smith") and numbered list markers are not sentence ends
+- the first segment may end at a clause (",", ";", ":") so audio starts early,
+  later segments merge short sentences for better prosody and throughput
+- markdown emphasis, headings, list markers and links are stripped, code blocks are not spoken
+"""
+
+import re
+
+ABBREVIATIONS = {
+    "mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "vs", "etc", "e.g", "i.e", "cf",
+    "approx", "fig", "no", "vol", "inc", "ltd", "co", "corp", "dept", "est", "min", "max",
+    "u.s", "u.k", "a.m", "p.m", "jan", "feb", "mar", "apr", "jun", "jul", "aug", "sep",
+    "sept", "oct", "nov", "dec",
+}
+TERMINALS = ".!?"
+CLAUSES = ",;:"
+# Characters that may follow a terminal and still belong to the sentence
+CLOSERS = "\"')]*_”’"
+
+_LINK = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+_LINE_MARKUP = re.compile(r"^\s*(?:#{1,6}\s+|>\s*|[-*+]\s+|\d+[.)]\s+)", re.MULTILINE)
+_INLINE_MARKUP = re.compile(r"\*\*|__|[*`~]")
+_SPEAKABLE = re.compile(r"\w")
+
+
+def clean_markdown(text: str) -> str:
+    """Strip markdown that should not be read aloud."""
+    text = _LINK.sub(r"\1", text)
+    text = _LINE_MARKUP.sub("", text)
+    text = _INLINE_MARKUP.sub("", text)
+    return " ".join(text.split())
+
+
+class SENTENCE_SEGMENTER:
+    def __init__(self, first_min_chars=20, min_chars=60, max_chars=300):
+        self.first_min_chars = first_min_chars
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self.reset()
+
+    def reset(self):
+        self._text = ""
+        self._pos = 0            # next character to examine
+        self._seg_start = 0      # start of the segment being built
+        self._word_start = 0     # start of the current word
+        self._last_clause = -1   # end of the last clause boundary inside the segment
+        self._last_space = -1
+        self._in_code = False
+        self.segments_emitted = 0
+
+    def _emit(self, end: int, out: list):
+        segment = clean_markdown(self._text[self._seg_start:end])
+        if _SPEAKABLE.search(segment):
+            out.append(segment)
+            self.segments_emitted += 1
+        # Drop consumed text so the buffer stays small
+        self._text = self._text[end:]
+        self._pos = max(0, self._pos - end)
+        self._word_start = max(0, self._word_start - end)
+        self._seg_start = 0
+        self._last_clause = -1
+        self._last_space = -1
+
+    def _is_abbreviation(self, end: int, after: int) -> bool | None:
+        """None when it depends on the next word, which has not arrived yet."""
+        raw = self._text[self._word_start:end].lstrip("\"'([*_")
+        word = raw.lower()
+        if word in ABBREVIATIONS:
+            return True
+        if len(raw) == 1 and raw.isupper() and raw not in "IA":
+            # An initial ("J. Smith"), unless the next word starts lowercase
+            k = after
+            while k < len(self._text) and self._text[k].isspace():
+                k += 1
+            if k >= len(self._text):
+                return None
+            return self._text[k].isupper()
+        # "1." at the start of a line is a list marker
+        line_start = self._word_start == 0 or self._text[self._word_start - 1] == "\n"
+        return word.isdigit() and line_start
+
+    def feed(self, text: str) -> list[str]:
+        """Add streamed text; returns the segments that are now complete."""
+        self._text += text
+        out = []
+        while self._pos < len(self._text):
+            i = self._pos
+            c = self._text[i]
+            n = len(self._text)
+
+            if c == "`" and n - i < 3 and self._text[i:] == "`" * (n - i):
+                break  # could be the start of a fence; wait for more text
+            if c == "`" and self._text.startswith("```", i):
+                if not self._in_code:
+                    self._emit(i, out)
+                    self._in_code = True
+                    self._pos = 3
+                else:
+                    # Drop the code block entirely
+                    self._in_code = False
+                    self._text = self._text[i + 3:]
+                    self._pos = self._seg_start = self._word_start = 0
+                    self._last_clause = self._last_space = -1
+                continue
+            if self._in_code:
+                self._pos += 1
+                continue
+
+            if c.isspace():
+                if c == "\n" and self._text[self._seg_start:i].strip():
+                    # Line breaks end list items and paragraphs
+                    self._emit(i + 1, out)
+                    continue
+                self._last_space = i
+                self._word_start = i + 1
+                self._pos += 1
+                continue
+
+            if c in TERMINALS or c in CLAUSES:
+                # Look past closing quotes/brackets to the next real character
+                j = i + 1
+                while j < n and self._text[j] in CLOSERS:
+                    j += 1
+                if j >= n:
+                    break  # boundary not decidable yet
+                if self._text[j] in TERMINALS and c in TERMINALS:
+                    self._pos = j  # "..." / "?!" end at the last mark
+                    continue
+                if self._text[j].isspace():
+                    length = j - self._seg_start
+                    abbreviation = c == "." and self._is_abbreviation(i, j)
+                    if abbreviation is None:
+                        break  # boundary not decidable yet
+                    if c in TERMINALS and not abbreviation:
+                        if self.segments_emitted == 0 or length >= self.min_chars:
+                            self._emit(j, out)
+                            continue
+                        self._last_clause = j
+                    elif c in CLAUSES:
+                        if self.segments_emitted == 0 and length >= self.first_min_chars:
+                            self._emit(j, out)
+                            continue
+                        self._last_clause = j
+
+            if i - self._seg_start >= self.max_chars:
+                # Runaway sentence: cut at the last clause or word boundary
+                cut = self._last_clause if self._last_clause > self._seg_start else self._last_space
+                if cut > self._seg_start:
+                    self._emit(cut, out)
+                    continue
+            self._pos += 1
+        return out
+
+    def flush(self) -> list[str]:
+        """Return whatever is left at the end of the response."""
+        out = []
+        if not self._in_code and self._text[self._seg_start:].strip():
+            self._emit(len(self._text), out)
+        self.reset()
+        return out
@@ -0,0 +1,364 @@
+"""
+Headless mode: Luma as a local streaming HTTP API (TCP or a Unix socket) instead of the
+terminal prompt, so a GUI or other clients can talk to one running process.
+Each session has its own MAIN_MODEL and history; all sessions share the loaded TTS
+pipeline and its thread, the tool thread pool and the Ollama client's connection pool.
+
+    POST   /sessions                    -> {"session": "<id>"}
+    POST   /sessions/<id>/turns         {"prompt": "...", "audio": true, "format": "s16"}
+                                        -> NDJSON stream, one event per line:
+        {"type": "text", "text": "..."}
+        {"type": "audio", "index": 0, "sample_rate": 24000, "format": "s16", "frames": 4800, "data": "<base64 PCM>"}
+        {"type": "done", "interrupted": false}
+    POST   /sessions/<id>/interrupt     -> stops the running turn
+    POST   /sessions/<id>/reset         -> clears the session's history
+    DELETE /sessions/<id>
+    GET    /health
+
+    curl -N -X POST http://127.0.0.1:8765/sessions/<id>/turns -d '{"prompt": "Hi"}'
+    curl --unix-socket /tmp/luma.sock -X POST http://luma/sessions
+
+Audio is mono PCM (f32 or s16 little-endian) at the TTS sample rate, one event per
+synthesized chunk.
+"""
+
+import asyncio
+import base64
+import json
+import os
+import time
+import uuid
+from http import HTTPStatus
+from threading import Event
+
+import numpy as np
+
+import LOGS
+import TRACING
+from QUEUES import AUDIO_QUEUE, METERED_QUEUE
+from SEGMENTER import SENTENCE_SEGMENTER
+
+AUDIO_FORMATS = ("f32", "s16")
+MAX_BODY_BYTES = 1 << 20
+HEADER_TIMEOUT = 10.0
+
+
+class HTTP_ERROR(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def encode_audio(frames: np.ndarray, sample_format: str) -> bytes:
+    """Little-endian PCM bytes of float32 frames."""
+    if sample_format == "s16":
+        return (np.clip(frames, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+    return frames.astype("<f4", copy=False).tobytes()
+
+
+class SESSION:
+    def __init__(self, session_id: str, model, segmenter: SENTENCE_SEGMENTER):
+        self.id = session_id
+        self.model = model
+        self.segmenter = segmenter
+        self.stop_event = Event()
+        self.turn = None  # asyncio.Task of the running turn
+        self.last_used = time.monotonic()
+
+    @property
+    def busy(self) -> bool:
+        return self.turn is not None and not self.turn.done()
+
+    def interrupt(self):
+        self.stop_event.set()
+        if self.busy:
+            self.turn.cancel()
+
+
+class LUMA_SERVER:
+    """Serves sessions over HTTP/1.1; every request is answered on its own connection.
+    model_factory() returns a new MAIN_MODEL for each session; synthesis_worker is
+    main.synthesis_worker, which runs segments through the shared TTS thread."""
+
+    def __init__(self, model_factory, tts, synthesis_worker, host="127.0.0.1", port=8765, socket_path=None,
+                 max_sessions=8, idle_timeout=1800.0, text_queue_size=1024, audio_queue_seconds=4.0,
+                 batch_window=0.02, max_batch=4, segmenter_settings=None):
+        self.model_factory = model_factory
+        self.tts = tts
+        self.synthesis_worker = synthesis_worker
+        self.host = host
+        self.port = port
+        self.socket_path = socket_path
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.text_queue_size = text_queue_size
+        self.audio_queue_seconds = audio_queue_seconds
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.segmenter_settings = segmenter_settings or {}
+        self.sessions = {}
+        self._server = None
+        self._reaper = None
+
+    @classmethod
+    def from_config(cls, config, model_factory, tts, synthesis_worker):
+        return cls(
+            model_factory, tts, synthesis_worker,
+            host=config.get('SERVER', 'HOST', fallback='127.0.0.1'),
+            port=config.getint('SERVER', 'PORT', fallback=8765),
+            socket_path=config.get('SERVER', 'SOCKET', fallback='') or None,
+            max_sessions=config.getint('SERVER', 'MAX_SESSIONS', fallback=8),
+            idle_timeout=config.getfloat('SERVER', 'IDLE_MINUTES', fallback=30) * 60,
+            text_queue_size=config.getint('PIPELINE', 'TEXT_QUEUE_SIZE', fallback=1024),
+            audio_queue_seconds=config.getfloat('PIPELINE', 'AUDIO_QUEUE_SECONDS', fallback=4.0),
+            batch_window=config.getfloat('PIPELINE', 'BATCH_WINDOW_MS', fallback=20) / 1000,
+            max_batch=config.getint('PIPELINE', 'MAX_BATCH', fallback=4),
+            segmenter_settings={
+                "first_min_chars": config.getint('PIPELINE', 'FIRST_SEGMENT_CHARS', fallback=20),
+                "min_chars": config.getint('PIPELINE', 'MIN_SEGMENT_CHARS', fallback=60),
+                "max_chars": config.getint('PIPELINE', 'MAX_SEGMENT_CHARS', fallback=300),
+            },
+        )
+
+    @property
+    def address(self) -> str:
+        return f"unix:{self.socket_path}" if self.socket_path else f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        if self.socket_path:
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            self._server = await asyncio.start_unix_server(self._handle, path=self.socket_path)
+        else:
+            self._server = await asyncio.start_server(self._handle, self.host, self.port)
+            self.port = self._server.sockets[0].getsockname()[1]
+        self._reaper = asyncio.create_task(self._reap_idle_sessions())
+        LOGS.log_success(f"Luma API listening on {self.address}")
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        await self._server.serve_forever()
+
+    async def close(self):
+        for session in self.sessions.values():
+            session.interrupt()
+        self.sessions.clear()
+        if self._reaper is not None:
+            self._reaper.cancel()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self.socket_path and os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    async def _reap_idle_sessions(self):
+        while True:
+            await asyncio.sleep(min(self.idle_timeout, 60))
+            now = time.monotonic()
+            for session_id, session in list(self.sessions.items()):
+                if not session.busy and now - session.last_used > self.idle_timeout:
+                    del self.sessions[session_id]
+                    LOGS.log_info(f"Session {session_id} closed after being idle")
+
+    # ------------------------------------------------------------------ HTTP
+
+    @staticmethod
+    async def _read_request(reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, _ = line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise HTTP_ERROR(400, "Malformed request line")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = headers.get("content-length") or "0"
+        if not (length.isascii() and length.isdigit()):
+            raise HTTP_ERROR(400, "Invalid Content-Length")
+        length = int(length)
+        if length > MAX_BODY_BYTES:
+            raise HTTP_ERROR(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target.split("?", 1)[0], body
+
+    @staticmethod
+    def _head(status: int, content_type: str, extra: str = "") -> bytes:
+        return (f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\nContent-Type: {content_type}\r\n"
+                f"{extra}Connection: close\r\n\r\n").encode("latin-1")
+
+    async def _send_json(self, writer, status: int, obj: dict):
+        body = json.dumps(obj).encode()
+        writer.write(self._head(status, "application/json", f"Content-Length: {len(body)}\r\n") + body)
+        await writer.drain()
+
+    async def _handle(self, reader, writer):
+        try:
+            try:
+                request = await asyncio.wait_for(self._read_request(reader), HEADER_TIMEOUT)
+                if request is not None:
+                    await self._route(writer, *request)
+            except HTTP_ERROR as e:
+                await self._send_json(writer, e.status, {"error": e.message})
+            except asyncio.TimeoutError:
+                pass
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            LOGS.log_error(f"Server request failed: {e}")
+        finally:
+            writer.close()
+
+    async def _route(self, writer, method: str, path: str, body: bytes):
+        parts = [p for p in path.split("/") if p]
+        if parts == ["health"]:
+            if method != "GET":
+                raise HTTP_ERROR(405, "Use GET")
+            await self._send_json(writer, 200, {
+                "ok": True,
+                "sessions": len(self.sessions),
+                "tts_ready": self.tts.ready.is_set(),
+            })
+        elif parts == ["sessions"]:
+            if method != "POST":
+                raise HTTP_ERROR(405, "Use POST")
+            await self._send_json(writer, 201, {"session": self._create_session().id})
+        elif len(parts) >= 2 and parts[0] == "sessions":
+            session = self.sessions.get(parts[1])
+            if session is None:
+                raise HTTP_ERROR(404, "No such session")
+            session.last_used = time.monotonic()
+            action = parts[2:]
+            if action == [] and method == "DELETE":
+                session.interrupt()
+                del self.sessions[session.id]
+                await self._send_json(writer, 200, {"closed": session.id})
+            elif action == ["turns"] and method == "POST":
+                await self._stream_turn(writer, session, self._parse_turn(body))
+            elif action == ["interrupt"] and method == "POST":
+                interrupted = session.busy
+                session.interrupt()
+                await self._send_json(writer, 200, {"interrupted": interrupted})
+            elif action == ["reset"] and method == "POST":
+                if session.busy:
+                    raise HTTP_ERROR(409, "A turn is running")
+                session.model.clear_history()
+                await self._send_json(writer, 200, {"reset": session.id})
+            else:
+                raise HTTP_ERROR(404, "Unknown endpoint")
+        else:
+            raise HTTP_ERROR(404, "Unknown endpoint")
+
+    def _create_session(self) -> SESSION:
+        if len(self.sessions) >= self.max_sessions:
+            raise HTTP_ERROR(503, f"Session limit ({self.max_sessions}) reached")
+        session = SESSION(uuid.uuid4().hex, self.model_factory(), SENTENCE_SEGMENTER(**self.segmenter_settings))
+        self.sessions[session.id] = session
+        LOGS.log_info(f"Session {session.id} opened")
+        return session
+
+    @staticmethod
+    def _parse_turn(body: bytes) -> dict:
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError:
+            raise HTTP_ERROR(400, "Body must be JSON")
+        prompt = request.get("prompt") if isinstance(request, dict) else None
+        if not isinstance(prompt, str) or not prompt.strip():
+            raise HTTP_ERROR(400, "Missing prompt")
+        sample_format = request.get("format", "s16")
+        if sample_format not in AUDIO_FORMATS:
+            raise HTTP_ERROR(400, f"format must be one of {', '.join(AUDIO_FORMATS)}")
+        return {"prompt": prompt, "audio": bool(request.get("audio", True)), "sample_format": sample_format}
+
+    # ------------------------------------------------------------------ turns
+
+    async def _stream_turn(self, writer, session: SESSION, request: dict):
+        if session.busy:
+            raise HTTP_ERROR(409, "A turn is already running in this session")
+        writer.write(self._head(200, "application/x-ndjson", "Transfer-Encoding: chunked\r\n"))
+
+        async def send(event: dict):
+            line = json.dumps(event).encode() + b"\n"
+            writer.write(b"%x\r\n%s\r\n" % (len(line), line))
+            await writer.drain()
+
+        session.turn = asyncio.create_task(self._run_turn(session, send, **request))
+        interrupted = False
+        try:
+            await session.turn
+        except asyncio.CancelledError:
+            # Interrupted through the API, unless this request itself is being cancelled
+            if asyncio.current_task().cancelling():
+                raise
+            interrupted = True
+        await send({"type": "done", "interrupted": interrupted})
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def _run_turn(self, session: SESSION, send, prompt: str, audio: bool, sample_format: str):
+        session.stop_event.clear()
+        text_queue = METERED_QUEUE(maxsize=self.text_queue_size, name="text")
+        audio_queue = AUDIO_QUEUE(self.audio_queue_seconds, self.tts.sink.sample_rate)
+
+        turn = TRACING.new_turn()
+        try:
+            with TRACING.span("turn", prompt_chars=len(prompt), session=session.id):
+                tasks = [asyncio.create_task(self._fetch_text(session, prompt, send, text_queue if audio else None))]
+                if audio:
+                    tasks += [
+                        asyncio.create_task(self.synthesis_worker(text_queue, audio_queue, session.segmenter,
+                                                                  self.batch_window, self.max_batch,
+                                                                  stop=session.stop_event)),
+                        asyncio.create_task(self._send_audio(audio_queue, send, sample_format)),
+                    ]
+                try:
+                    await asyncio.gather(*tasks)
+                finally:
+                    # A failed send means the client went away: stop synthesis for it too
+                    session.stop_event.set()
+                    for task in tasks:
+                        task.cancel()
+                    await asyncio.gather(*tasks, return_exceptions=True)
+                    session.segmenter.reset()
+        finally:
+            TRACING.end_turn(turn)
+            session.last_used = time.monotonic()
+
+    async def _fetch_text(self, session: SESSION, prompt: str, send, text_queue):
+        try:
+            async for chunk in session.model.generate_response(prompt):
+                if session.stop_event.is_set():
+                    break
+                await send({"type": "text", "text": chunk})
+                if text_queue is not None:
+                    await text_queue.put(chunk)
+        except (asyncio.CancelledError, ConnectionError):
+            raise
+        except Exception as e:
+            LOGS.log_error(f"Session {session.id} text error: {e}")
+            await send({"type": "error", "error": str(e)})
+        if text_queue is not None:
+            await text_queue.put(None)
+
+    async def _send_audio(self, audio_queue: AUDIO_QUEUE, send, sample_format: str):
+        index = 0
+        while (audio := await audio_queue.get()) is not None:
+            frames = self.tts._to_frames(audio)
+            await send({
+                "type": "audio",
+                "index": index,
+                "sample_rate": self.tts.sink.sample_rate,
+                "format": sample_format,
+                "frames": len(frames),
+                "data": base64.b64encode(encode_audio(frames, sample_format)).decode("ascii"),
+            })
+            index += 1
@@ -0,0 +1,41 @@
+"""
+Records how long each startup stage takes.
+Stages run on different threads (the TTS load, the Ollama warm-up), so every entry
+keeps its own start/end offset from process start and the thread it ran on.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+
+class STARTUP_TIMELINE:
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self._stages = []
+        self._lock = threading.Lock()
+
+    def record(self, name: str, start: float, end: float):
+        with self._lock:
+            self._stages.append((start - self.origin, end - self.origin, name, threading.current_thread().name))
+
+    def mark(self, name: str):
+        """Record a stage that spans from process start until now (e.g. module imports)."""
+        self.record(name, self.origin, time.perf_counter())
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter())
+
+    def report(self) -> str:
+        with self._lock:
+            stages = sorted(self._stages)
+        width = max((len(name) for _, _, name, _ in stages), default=0)
+        lines = ["Startup timeline (seconds since start):"]
+        for start, end, name, thread in stages:
+            lines.append(f"  {name:<{width}}  {start:7.3f} -> {end:7.3f}  ({end - start:6.3f}s)  [{thread}]")
+        return "\n".join(lines)
@@ -0,0 +1,162 @@
+"""
+Native backends for system control that avoid starting a shell per action.
+- sysfs is read and written with plain file I/O
+- PulseAudio/PipeWire is driven over one persistent native-protocol connection (pulsectl)
+- Media players are controlled over one persistent D-Bus session connection (MPRIS via Gio)
+Every backend is optional: callers fall back to the shell commands in SYSTEM_CALLS
+when a backend is unavailable or an operation fails.
+"""
+
+import os
+from threading import Lock
+
+import LOGS
+
+try:
+    import pulsectl
+except (ImportError, OSError):  # OSError: libpulse itself is missing
+    pulsectl = None
+
+try:
+    from gi.repository import Gio, GLib
+except ImportError:
+    Gio = None
+    GLib = None
+
+
+# ============================================================================
+# SYSFS
+# ============================================================================
+
+def read_sysfs(path: str) -> str | None:
+    """Read a sysfs attribute, or None if it cannot be read."""
+    try:
+        with open(path, 'r') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def write_sysfs(path: str, value) -> bool:
+    """Write a sysfs attribute. Returns False (e.g. on EACCES) so callers can retry via sudo."""
+    try:
+        with open(path, 'w') as f:
+            f.write(str(value))
+        return True
+    except OSError:
+        return False
+
+def list_sysfs(path: str) -> list[str]:
+    try:
+        return sorted(os.listdir(path))
+    except OSError:
+        return []
+
+
+# ============================================================================
+# PULSEAUDIO / PIPEWIRE
+# ============================================================================
+
+class PULSE_BACKEND:
+    """Default-sink volume control over a persistent pulsectl connection."""
+
+    def __init__(self):
+        if pulsectl is None:
+            raise RuntimeError("pulsectl is not installed")
+        # pulsectl connections are not thread-safe
+        self._lock = Lock()
+        self._pulse = pulsectl.Pulse('luma')
+
+    def _reconnect(self):
+        try:
+            self._pulse.close()
+        except Exception:
+            pass
+        self._pulse = pulsectl.Pulse('luma')
+
+    def _with_sink(self, action):
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    sink = self._pulse.get_sink_by_name(self._pulse.server_info().default_sink_name)
+                    return action(self._pulse, sink)
+                except pulsectl.PulseError as e:
+                    if attempt:
+                        LOGS.log_error(f"PulseAudio call failed: {e}")
+                        return None
+                    try:
+                        self._reconnect()
+                    except pulsectl.PulseError as e:
+                        # Callers fall back to pactl/amixer on None
+                        LOGS.log_error(f"PulseAudio reconnect failed: {e}")
+                        return None
+
+    def get_volume(self) -> int | None:
+        return self._with_sink(lambda pulse, sink: round(pulse.volume_get_all_chans(sink) * 100))
+
+    def set_volume(self, level: int) -> bool:
+        return self._with_sink(lambda pulse, sink: pulse.volume_set_all_chans(sink, level / 100) or True) is True
+
+    def set_mute(self, mute: bool | None) -> bool:
+        """Mute, unmute, or toggle when mute is None."""
+        def action(pulse, sink):
+            pulse.mute(sink, (not sink.mute) if mute is None else mute)
+            return True
+        return self._with_sink(action) is True
+
+    def close(self):
+        with self._lock:
+            self._pulse.close()
+
+
+# ============================================================================
+# MPRIS (D-Bus)
+# ============================================================================
+
+MPRIS_PREFIX = 'org.mpris.MediaPlayer2.'
+MPRIS_PATH = '/org/mpris/MediaPlayer2'
+MPRIS_PLAYER = 'org.mpris.MediaPlayer2.Player'
+
+class MPRIS_BACKEND:
+    """Media control over a persistent D-Bus session bus connection."""
+
+    def __init__(self, timeout_ms=2000):
+        if Gio is None:
+            raise RuntimeError("PyGObject (gi) is not installed")
+        self.timeout_ms = timeout_ms
+        self._bus = Gio.bus_get_sync(Gio.BusType.SESSION, None)
+
+    def _call(self, bus_name, path, interface, method, args=None):
+        return self._bus.call_sync(
+            bus_name, path, interface, method, args, None,
+            Gio.DBusCallFlags.NONE, self.timeout_ms, None
+        )
+
+    def players(self) -> list[str]:
+        names = self._call('org.freedesktop.DBus', '/org/freedesktop/DBus',
+                           'org.freedesktop.DBus', 'ListNames').unpack()[0]
+        return [name for name in names if name.startswith(MPRIS_PREFIX)]
+
+    def _active_player(self) -> str | None:
+        players = self.players()
+        # Prefer whatever is currently playing, like playerctl does
+        for name in players:
+            try:
+                status = self._call(name, MPRIS_PATH, 'org.freedesktop.DBus.Properties', 'Get',
+                                    GLib.Variant('(ss)', (MPRIS_PLAYER, 'PlaybackStatus'))).unpack()[0]
+                if status == 'Playing':
+                    return name
+            except GLib.Error:
+                continue
+        return players[0] if players else None
+
+    def player_command(self, method: str) -> bool:
+        """Call PlayPause/Next/Previous on the active player."""
+        try:
+            player = self._active_player()
+            if player is None:
+                return False
+            self._call(player, MPRIS_PATH, MPRIS_PLAYER, method)
+            return True
+        except GLib.Error as e:
+            LOGS.log_error(f"MPRIS {method} failed: {e}")
+            return False
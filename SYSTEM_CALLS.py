@@ -1,12 +1,20 @@
 """
 System control functions that work both natively and inside Docker containers.
 When running in Docker, commands are executed on the host via nsenter.
-When running natively, commands are executed directly.
+When running natively, sysfs, PulseAudio and MPRIS are used directly through
+SYSTEM_BACKENDS where possible, and shell commands are the fallback.
 """
 
+import atexit
 import subprocess
 import os
+import re
+import time
+from threading import Lock, Thread
 import LOGS
+import TRACING
+from SYSTEM_BACKENDS import read_sysfs, write_sysfs, list_sysfs, PULSE_BACKEND, MPRIS_BACKEND
+from HOST_AGENT import HOST_AGENT
 
 # Detect if running inside Docker
 def is_docker():
@@ -23,28 +31,76 @@ def is_docker():
 
 IN_DOCKER = is_docker()
 
+# In Docker, commands go through one persistent agent in the host namespaces
+# instead of a new nsenter per command; nsenter per command remains the fallback.
+HOST_AGENT_RETRY_SECONDS = 30
+_host_agent = None
+_host_agent_enabled = True
+_host_agent_failed_at = None
+_host_agent_lock = Lock()
+
+def set_host_agent_enabled(enabled: bool) -> None:
+    global _host_agent_enabled
+    _host_agent_enabled = enabled
+    if not enabled:
+        stop_host_agent()
+
+def get_host_agent() -> HOST_AGENT | None:
+    """Start (or restart) the host agent on demand. Returns None when it cannot be used."""
+    global _host_agent, _host_agent_failed_at
+    if not IN_DOCKER or not _host_agent_enabled:
+        return None
+    with _host_agent_lock:
+        if _host_agent is not None and _host_agent.alive():
+            return _host_agent
+        if _host_agent_failed_at is not None and time.monotonic() - _host_agent_failed_at < HOST_AGENT_RETRY_SECONDS:
+            return None
+        try:
+            TRACING.count("subprocess_launches_total", kind="host_agent")
+            _host_agent = HOST_AGENT()
+            _host_agent_failed_at = None
+            LOGS.log_info("Host agent started")
+        except Exception as e:
+            LOGS.log_warning(f"Host agent unavailable, using nsenter per command: {e}")
+            _host_agent = None
+            _host_agent_failed_at = time.monotonic()
+        return _host_agent
+
+def stop_host_agent() -> None:
+    global _host_agent
+    with _host_agent_lock:
+        if _host_agent is not None:
+            _host_agent.close()
+            _host_agent = None
+
+def host_command(command: str) -> list[str]:
+    """Build the argv that runs a shell command on the host (through nsenter in Docker)."""
+    if IN_DOCKER:
+        # Use nsenter to execute on host
+        return ['nsenter', '-t', '1', '-m', '-u', '-n', '-i', '--', 'sh', '-c', command]
+    # Execute directly on host
+    return ['sh', '-c', command]
+
 def execute_on_host(command: str) -> tuple[bool, str]:
     """
     Executes a shell command. If in Docker, uses nsenter to run on host.
     Returns (success: bool, output: str)
     """
+    agent = get_host_agent()
+    with TRACING.span("host_command", via="agent" if agent is not None else "subprocess", op="sh") as span:
+        success, output = agent.run(command) if agent is not None else _run_host_subprocess(command)
+        span.set(success=success)
+    return success, output
+
+def _run_host_subprocess(command: str) -> tuple[bool, str]:
+    TRACING.count("subprocess_launches_total", kind="nsenter" if IN_DOCKER else "sh")
     try:
-        if IN_DOCKER:
-            # Use nsenter to execute on host
-            result = subprocess.run(
-                ['nsenter', '-t', '1', '-m', '-u', '-n', '-i', '--', 'sh', '-c', command],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-        else:
-            # Execute directly on host
-            result = subprocess.run(
-                ['sh', '-c', command],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
+        result = subprocess.run(
+            host_command(command),
+            capture_output=True,
+            text=True,
+            timeout=10
+        )
         
         if result.returncode == 0:
             return True, result.stdout.strip()
@@ -57,25 +113,186 @@ def execute_on_host(command: str) -> tuple[bool, str]:
     except Exception as e:
         return False, str(e)
 
+def execute_batch_on_host(commands: list[str]) -> list[tuple[bool, str]]:
+    """Execute several shell commands at once (one round trip through the host agent)."""
+    agent = get_host_agent()
+    if agent is not None:
+        with TRACING.span("host_command", via="agent", op="sh", commands=len(commands)) as span:
+            results = agent.run_batch(commands)
+            span.set(success=all(success for success, _ in results))
+        return results
+    return [execute_on_host(command) for command in commands]
+
 def read_file_on_host(filepath: str) -> tuple[bool, str]:
     """Read a file from the host filesystem."""
+    if not IN_DOCKER:
+        content = read_sysfs(filepath)
+        if content is not None:
+            return True, content
+    else:
+        agent = get_host_agent()
+        if agent is not None:
+            with TRACING.span("host_command", via="agent", op="read") as span:
+                success, content = agent.read_file(filepath)
+                span.set(success=success)
+            return success, content
     success, output = execute_on_host(f'cat "{filepath}"')
     return success, output
 
+def _agent_write(agent: HOST_AGENT, filepath: str, content: str) -> bool:
+    with TRACING.span("host_command", via="agent", op="write") as span:
+        success = agent.write_file(filepath, content)
+        span.set(success=success)
+    return success
+
+def _write_sysfs_direct(filepath: str, value) -> bool:
+    """Write a sysfs attribute without a shell: file I/O natively, the host agent in Docker."""
+    if not IN_DOCKER:
+        return write_sysfs(filepath, value)
+    agent = get_host_agent()
+    return agent is not None and _agent_write(agent, filepath, str(value))
+
 def write_file_on_host(filepath: str, content: str) -> bool:
     """Write content to a file on the host filesystem."""
+    if not IN_DOCKER and write_sysfs(filepath, content + '\n'):
+        return True
+    agent = get_host_agent()
+    if agent is not None and _agent_write(agent, filepath, content + '\n'):
+        return True
     # Escape content for shell
     escaped = content.replace("'", "'\\''")
     success, _ = execute_on_host(f"echo '{escaped}' > \"{filepath}\"")
     return success
 
 
+# ============================================================================
+# NATIVE BACKENDS
+# ============================================================================
+
+# Persistent PulseAudio / D-Bus connections; one that failed to open is retried after a while
+# (e.g. the audio server or session bus was not up yet)
+NATIVE_BACKEND_RETRY_SECONDS = 60
+_native_backends = {}
+_native_failed_at = {}
+_native_lock = Lock()
+
+def _get_native_backend(name: str, factory):
+    with _native_lock:
+        if name in _native_backends:
+            return _native_backends[name]
+        failed_at = _native_failed_at.get(name)
+        if failed_at is not None and time.monotonic() - failed_at < NATIVE_BACKEND_RETRY_SECONDS:
+            return None
+        try:
+            _native_backends[name] = factory()
+        except Exception as e:
+            if failed_at is None:
+                LOGS.log_warning(f"Native {name} backend unavailable, using shell commands: {e}")
+            _native_failed_at[name] = time.monotonic()
+            return None
+        _native_failed_at.pop(name, None)
+        return _native_backends[name]
+
+def get_pulse_backend() -> PULSE_BACKEND | None:
+    """PulseAudio/PipeWire connection; also works in Docker when PULSE_SERVER is forwarded."""
+    return _get_native_backend('pulse', PULSE_BACKEND)
+
+def get_mpris_backend() -> MPRIS_BACKEND | None:
+    """Session D-Bus connection for MPRIS; only used natively, the container has no session bus."""
+    if IN_DOCKER:
+        return None
+    return _get_native_backend('mpris', MPRIS_BACKEND)
+
+
+# ============================================================================
+# PROBE CACHE
+# ============================================================================
+
+# Results of hardware discovery (backlight device, max brightness, audio backend).
+# Entries are dropped when a command using them fails or a udev hotplug event arrives.
+_probe_cache = {}
+_probe_lock = Lock()
+_hotplug_thread = None
+_hotplug_proc = None
+# "UDEV  [1234.567890] add /devices/... (backlight)"; the banner before the first event
+# ("UDEV - the event which udev sends out after rule processing") does not match
+_HOTPLUG_EVENT = re.compile(r"^(?:UDEV|KERNEL)\s*\[")
+
+def _cached_probe(key: str, probe):
+    """Return the cached value for key, running probe() on a miss. None is never cached."""
+    with _probe_lock:
+        if key in _probe_cache:
+            return _probe_cache[key]
+    value = probe()
+    if value is not None:
+        with _probe_lock:
+            _probe_cache[key] = value
+    return value
+
+def invalidate_probe_cache(*keys: str) -> None:
+    """Forget cached probe results (all of them when no keys are given)."""
+    with _probe_lock:
+        if not keys:
+            _probe_cache.clear()
+        for key in keys:
+            _probe_cache.pop(key, None)
+
+def _watch_hotplug(proc):
+    for line in proc.stdout:
+        if _HOTPLUG_EVENT.match(line):
+            invalidate_probe_cache()
+
+def start_hotplug_monitor() -> bool:
+    """Invalidate the probe cache whenever a backlight or sound device appears or disappears."""
+    global _hotplug_thread, _hotplug_proc
+    if _hotplug_thread is not None and _hotplug_thread.is_alive():
+        return True
+    try:
+        TRACING.count("subprocess_launches_total", kind="udevadm")
+        proc = subprocess.Popen(
+            host_command('exec udevadm monitor --udev --subsystem-match=backlight --subsystem-match=sound'),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True
+        )
+    except (FileNotFoundError, OSError) as e:
+        LOGS.log_warning(f"Hotplug monitor unavailable: {e}")
+        return False
+    _hotplug_proc = proc
+    _hotplug_thread = Thread(target=_watch_hotplug, args=(proc,), name="hotplug-monitor", daemon=True)
+    _hotplug_thread.start()
+    # Also covers exits that skip the normal shutdown (sys.exit at the startup prompt)
+    atexit.register(stop_hotplug_monitor)
+    return True
+
+def stop_hotplug_monitor() -> None:
+    """Terminate udevadm monitor; its reader thread ends at EOF."""
+    global _hotplug_proc
+    proc, _hotplug_proc = _hotplug_proc, None
+    if proc is None:
+        return
+    proc.terminate()
+    try:
+        proc.wait(timeout=2)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
 # ============================================================================
 # SCREEN BRIGHTNESS CONTROLS
 # ============================================================================
 
 def get_backlight_path() -> str | None:
-    """Find the backlight device path on the host."""
+    """Find the backlight device path on the host (cached)."""
+    return _cached_probe('backlight_path', _probe_backlight_path)
+
+def _probe_backlight_path() -> str | None:
+    if not IN_DOCKER:
+        devices = list_sysfs('/sys/class/backlight')
+        if devices:
+            return f'/sys/class/backlight/{devices[0]}'
+
     backlight_dirs = [
         '/sys/class/backlight/intel_backlight',
         '/sys/class/backlight/amdgpu_bl0',
@@ -97,10 +314,14 @@ def get_backlight_path() -> str | None:
     return None
 
 def get_max_brightness() -> int:
-    """Get the maximum brightness value."""
+    """Get the maximum brightness value (cached)."""
+    max_brightness = _cached_probe('max_brightness', _probe_max_brightness)
+    return max_brightness if max_brightness is not None else 100
+
+def _probe_max_brightness() -> int | None:
     path = get_backlight_path()
     if not path:
-        return 100
+        return None
     
     success, output = read_file_on_host(f'{path}/max_brightness')
     if success:
@@ -108,7 +329,7 @@ def get_max_brightness() -> int:
             return int(output)
         except ValueError:
             pass
-    return 100
+    return None
 
 def get_screen_brightness() -> int | None:
     """Gets the current screen brightness (0-100)."""
@@ -127,6 +348,7 @@ def get_screen_brightness() -> int | None:
             LOGS.log_error(f"Invalid brightness value: {output}")
             return None
     else:
+        invalidate_probe_cache('backlight_path', 'max_brightness')
         LOGS.log_error(f"Failed to read brightness: {output}")
         return None
 
@@ -141,8 +363,12 @@ def set_screen_brightness(level: int) -> bool:
     max_brightness = get_max_brightness()
     actual_value = int((level / 100) * max_brightness)
     
-    # Need root/sudo for writing to sysfs
-    success, error = execute_on_host(f'echo {actual_value} | sudo tee "{path}/brightness" > /dev/null')
+    # Direct write works when the user has access (udev rule / video group) or via the root host agent
+    if _write_sysfs_direct(f'{path}/brightness', actual_value):
+        success, error = True, ""
+    else:
+        # Need root/sudo for writing to sysfs
+        success, error = execute_on_host(f'echo {actual_value} | sudo tee "{path}/brightness" > /dev/null')
     if not success:
         # Try without sudo (might work if permissions are set)
         success, error = execute_on_host(f'echo {actual_value} > "{path}/brightness"')
@@ -151,6 +377,7 @@ def set_screen_brightness(level: int) -> bool:
         LOGS.log_success(f"Screen brightness set to {level}%")
         return True
     else:
+        invalidate_probe_cache('backlight_path', 'max_brightness')
         LOGS.log_error(f"Failed to set screen brightness: {error}")
         return False
 
@@ -159,18 +386,50 @@ def set_screen_brightness(level: int) -> bool:
 # VOLUME CONTROLS
 # ============================================================================
 
+def get_audio_backend() -> str | None:
+    """Detect whether volume is controlled through pactl (PulseAudio/PipeWire) or amixer (ALSA), cached."""
+    return _cached_probe('audio_backend', _probe_audio_backend)
+
+def _probe_audio_backend() -> str | None:
+    success, output = execute_on_host(
+        "if pactl info >/dev/null 2>&1; then echo pactl; "
+        "elif amixer get Master >/dev/null 2>&1; then echo amixer; fi"
+    )
+    if success and output in ('pactl', 'amixer'):
+        return output
+    return None
+
+def _run_audio_command(pactl_command: str, amixer_command: str) -> tuple[bool, str]:
+    """Run the command for the detected backend, falling back to the other one if it fails."""
+    commands = {'pactl': pactl_command, 'amixer': amixer_command}
+    backend = get_audio_backend()
+    order = [backend] if backend else []
+    order += [name for name in ('pactl', 'amixer') if name != backend]
+
+    output = "no audio system found"
+    for name in order:
+        success, output = execute_on_host(commands[name])
+        if success:
+            if name != backend:
+                invalidate_probe_cache('audio_backend')
+            return True, output
+        if name == backend:
+            invalidate_probe_cache('audio_backend')
+    return False, output
+
 def get_volume() -> int | None:
     """Gets the current system volume (0-100)."""
-    # Try PulseAudio/PipeWire first
-    success, output = execute_on_host("pactl get-sink-volume @DEFAULT_SINK@ 2>/dev/null | grep -oP '\\d+%' | head -1 | tr -d '%'")
-    if success and output:
-        try:
-            return int(output)
-        except ValueError:
-            pass
-    
-    # Try ALSA
-    success, output = execute_on_host("amixer get Master 2>/dev/null | grep -oP '\\d+%' | head -1 | tr -d '%'")
+    pulse = get_pulse_backend()
+    if pulse is not None:
+        volume = pulse.get_volume()
+        if volume is not None:
+            return volume
+
+    # PulseAudio/PipeWire or ALSA, whichever was detected
+    success, output = _run_audio_command(
+        "pactl get-sink-volume @DEFAULT_SINK@ 2>/dev/null | grep -oP '\\d+%' | head -1 | tr -d '%' | grep .",
+        "amixer get Master 2>/dev/null | grep -oP '\\d+%' | head -1 | tr -d '%' | grep ."
+    )
     if success and output:
         try:
             return int(output)
@@ -184,14 +443,15 @@ def set_volume(level: int) -> bool:
     """Sets the system volume to the specified level (0-100)."""
     level = max(0, min(100, level))  # Clamp between 0-100
     
-    # Try PulseAudio/PipeWire first
-    success, _ = execute_on_host(f"pactl set-sink-volume @DEFAULT_SINK@ {level}%")
-    if success:
+    pulse = get_pulse_backend()
+    if pulse is not None and pulse.set_volume(level):
         LOGS.log_success(f"Volume set to {level}%")
         return True
-    
-    # Try ALSA
-    success, error = execute_on_host(f"amixer set Master {level}%")
+
+    success, error = _run_audio_command(
+        f"pactl set-sink-volume @DEFAULT_SINK@ {level}%",
+        f"amixer set Master {level}%"
+    )
     if success:
         LOGS.log_success(f"Volume set to {level}%")
         return True
@@ -201,9 +461,10 @@ def set_volume(level: int) -> bool:
 
 def mute_volume() -> bool:
     """Mutes the system volume."""
-    success, _ = execute_on_host("pactl set-sink-mute @DEFAULT_SINK@ 1")
+    pulse = get_pulse_backend()
+    success = pulse is not None and pulse.set_mute(True)
     if not success:
-        success, _ = execute_on_host("amixer set Master mute")
+        success, _ = _run_audio_command("pactl set-sink-mute @DEFAULT_SINK@ 1", "amixer set Master mute")
     
     if success:
         LOGS.log_success("Volume muted")
@@ -213,9 +474,10 @@ def mute_volume() -> bool:
 
 def unmute_volume() -> bool:
     """Unmutes the system volume."""
-    success, _ = execute_on_host("pactl set-sink-mute @DEFAULT_SINK@ 0")
+    pulse = get_pulse_backend()
+    success = pulse is not None and pulse.set_mute(False)
     if not success:
-        success, _ = execute_on_host("amixer set Master unmute")
+        success, _ = _run_audio_command("pactl set-sink-mute @DEFAULT_SINK@ 0", "amixer set Master unmute")
     
     if success:
         LOGS.log_success("Volume unmuted")
@@ -225,9 +487,10 @@ def unmute_volume() -> bool:
 
 def toggle_mute() -> bool:
     """Toggles mute state."""
-    success, _ = execute_on_host("pactl set-sink-mute @DEFAULT_SINK@ toggle")
+    pulse = get_pulse_backend()
+    success = pulse is not None and pulse.set_mute(None)
     if not success:
-        success, _ = execute_on_host("amixer set Master toggle")
+        success, _ = _run_audio_command("pactl set-sink-mute @DEFAULT_SINK@ toggle", "amixer set Master toggle")
     return success
 
 
@@ -235,18 +498,28 @@ def toggle_mute() -> bool:
 # MEDIA CONTROLS
 # ============================================================================
 
+def _mpris_command(method: str) -> bool:
+    mpris = get_mpris_backend()
+    return mpris is not None and mpris.player_command(method)
+
 def media_play_pause() -> bool:
     """Toggle play/pause for media."""
+    if _mpris_command("PlayPause"):
+        return True
     success, _ = execute_on_host("playerctl play-pause 2>/dev/null || dbus-send --print-reply --dest=org.mpris.MediaPlayer2.spotify /org/mpris/MediaPlayer2 org.mpris.MediaPlayer2.Player.PlayPause 2>/dev/null")
     return success
 
 def media_next() -> bool:
     """Skip to next track."""
+    if _mpris_command("Next"):
+        return True
     success, _ = execute_on_host("playerctl next 2>/dev/null")
     return success
 
 def media_previous() -> bool:
     """Go to previous track."""
+    if _mpris_command("Previous"):
+        return True
     success, _ = execute_on_host("playerctl previous 2>/dev/null")
     return success
 
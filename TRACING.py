@@ -0,0 +1,245 @@
+"""
+Per-turn tracing and metrics.
+Spans and events are written as JSON lines to a trace file by a background thread;
+counters and histograms are kept in memory and can be served in the Prometheus text
+format on a local port. Everything is off until configure() enables it, and a
+disabled span() costs one attribute check.
+
+Each record carries the id of the turn it belongs to (set by run_turn), so a trace
+can be cut into turns and the stages of a slow one compared:
+    {"type": "span", "name": "synthesis", "turn": 3, "start": 1718000000.123, "ms": 412.5, ...}
+"""
+
+import contextvars
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from queue import SimpleQueue
+
+import LOGS
+
+# Seconds; also used for the duration of every span
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PREFIX = "luma_"
+
+enabled = False
+current_turn = contextvars.ContextVar("luma_turn", default=None)
+
+_turn_ids = itertools.count(1)
+_records = None  # SimpleQueue of trace records, None when no trace file is written
+_writer = None
+_server = None
+_metrics_lock = threading.Lock()
+_counters = {}    # (name, labels) -> value
+_histograms = {}  # (name, labels) -> [bucket counts..., +Inf count, sum]
+_buckets = {}     # name -> bucket bounds
+
+
+def configure(trace_file: str | None = None, prometheus_port: int = 0, enable: bool = True):
+    """Turn tracing on; writes records to trace_file and serves /metrics on 127.0.0.1:prometheus_port."""
+    global enabled, _records, _writer, _server
+    enabled = enable
+    if not enable:
+        return
+    if trace_file and _writer is None:
+        _records = SimpleQueue()
+        _writer = threading.Thread(target=_write_loop, args=(trace_file,), name="trace-writer", daemon=True)
+        _writer.start()
+    if prometheus_port and _server is None:
+        try:
+            _server = ThreadingHTTPServer(("127.0.0.1", prometheus_port), _MetricsHandler)
+        except OSError as e:
+            LOGS.log_warning(f"Metrics endpoint disabled: {e}")
+        else:
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+            LOGS.log_info(f"Metrics served on http://127.0.0.1:{prometheus_port}/metrics")
+
+
+def shutdown():
+    """Flush the trace file and stop the metrics endpoint."""
+    global _writer, _server
+    if _writer is not None:
+        _records.put(None)
+        _writer.join(timeout=2)
+        _writer = None
+    if _server is not None:
+        _server.shutdown()
+        _server = None
+
+
+def _write_loop(path: str):
+    with open(path, "a", buffering=1 << 16) as f:
+        while True:
+            record = _records.get()
+            if record is None:
+                break
+            f.write(json.dumps(record, default=str) + "\n")
+            if _records.empty():
+                f.flush()
+
+
+def _emit(record: dict):
+    if _records is not None:
+        record["turn"] = current_turn.get()
+        record["thread"] = threading.current_thread().name
+        _records.put(record)
+
+
+def new_turn() -> contextvars.Token:
+    """Start a new turn in the current context; pass the token to end_turn()."""
+    return current_turn.set(next(_turn_ids))
+
+
+def end_turn(token: contextvars.Token):
+    current_turn.reset(token)
+
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+    def discard(self):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _Span:
+    def __init__(self, name: str, attributes: dict):
+        self.name = name
+        self.attributes = attributes
+        self._discarded = False
+
+    def __enter__(self):
+        self._wall = time.time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._discarded:
+            return False
+        seconds = time.perf_counter() - self._start
+        observe("span_seconds", seconds, span=self.name)
+        record = {"type": "span", "name": self.name, "start": self._wall, "ms": round(seconds * 1000, 3)}
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        record.update(self.attributes)
+        _emit(record)
+        return False
+
+    def set(self, **attributes):
+        """Attach attributes known only once the span is running (e.g. result sizes)."""
+        self.attributes.update(attributes)
+
+    def discard(self):
+        """Record nothing for this span, e.g. for a step that turned out to produce nothing."""
+        self._discarded = True
+
+
+def span(name: str, **attributes):
+    """Time a block: `with TRACING.span("synthesis", segments=3):`."""
+    if not enabled:
+        return _NO_SPAN
+    return _Span(name, attributes)
+
+
+def event(name: str, **attributes):
+    """Record a point in time (first token, playback start, ...)."""
+    if enabled:
+        record = {"type": "event", "name": name, "ts": time.time()}
+        record.update(attributes)
+        _emit(record)
+
+
+def _key(name: str, labels: dict) -> tuple:
+    return name, tuple(sorted(labels.items()))
+
+
+def count(name: str, value: float = 1, **labels):
+    if enabled:
+        key = _key(name, labels)
+        with _metrics_lock:
+            _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name: str, value: float, buckets=DEFAULT_BUCKETS, **labels):
+    """Add a value to a histogram; the buckets of a histogram are fixed by its first observation."""
+    if enabled:
+        key = _key(name, labels)
+        with _metrics_lock:
+            bounds = _buckets.setdefault(name, tuple(buckets))
+            histogram = _histograms.get(key)
+            if histogram is None:
+                histogram = _histograms[key] = [0] * (len(bounds) + 2)
+            for i, bound in enumerate(bounds):
+                if value <= bound:
+                    histogram[i] += 1
+                    break
+            else:
+                histogram[len(bounds)] += 1
+            histogram[-1] += value
+
+
+def _labels(labels: tuple, extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def prometheus_text() -> str:
+    """All counters and histograms in the Prometheus text exposition format."""
+    lines = []
+    with _metrics_lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((key, list(values)) for key, values in _histograms.items())
+        buckets = dict(_buckets)
+    typed = set()
+    for (name, labels), value in counters:
+        metric = PREFIX + name
+        if metric not in typed:
+            lines.append(f"# TYPE {metric} counter")
+            typed.add(metric)
+        lines.append(f"{metric}{_labels(labels)} {value}")
+    for (name, labels), values in histograms:
+        metric = PREFIX + name
+        if metric not in typed:
+            lines.append(f"# TYPE {metric} histogram")
+            typed.add(metric)
+        cumulative = 0
+        for bound, n in zip(buckets[name], values):
+            cumulative += n
+            le = f'le="{bound}"'
+            lines.append(f"{metric}_bucket{_labels(labels, le)} {cumulative}")
+        cumulative += values[len(buckets[name])]
+        le = 'le="+Inf"'
+        lines.append(f"{metric}_bucket{_labels(labels, le)} {cumulative}")
+        lines.append(f"{metric}_sum{_labels(labels)} {values[-1]}")
+        lines.append(f"{metric}_count{_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = prometheus_text().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
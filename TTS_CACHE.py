@@ -0,0 +1,140 @@
+"""
+Content-addressed cache of synthesized speech.
+Short phrases ("Done.", "Volume set to 50%.") repeat constantly, so their float32 audio
+is kept in an in-memory LRU and, optionally, in .npy files that are memory-mapped back
+on later runs. Both tiers are bounded by size and evict the least recently used entries.
+"""
+
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from threading import Lock
+
+import numpy as np
+
+import LOGS
+
+
+class TTS_CACHE:
+    def __init__(self, max_memory_mb=64, disk_dir=None, max_disk_mb=256, max_text_chars=200):
+        self.max_memory_bytes = int(max_memory_mb * 1024 * 1024)
+        self.max_disk_bytes = int(max_disk_mb * 1024 * 1024)
+        self.max_text_chars = max_text_chars
+        self.disk_dir = disk_dir or None
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = 0
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+        if self.disk_dir:
+            try:
+                os.makedirs(self.disk_dir, exist_ok=True)
+                self._disk_bytes = sum(size for _, _, size in self._disk_entries())
+            except OSError as e:
+                LOGS.log_warning(f"TTS disk cache disabled: {e}")
+                self.disk_dir = None
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a cache from the [TTS_CACHE] section of config.conf, or None if disabled."""
+        if not config.getboolean('TTS_CACHE', 'ENABLED', fallback=True):
+            return None
+        return cls(
+            max_memory_mb=config.getfloat('TTS_CACHE', 'MEMORY_MB', fallback=64),
+            disk_dir=config.get('TTS_CACHE', 'DIR', fallback=None),
+            max_disk_mb=config.getfloat('TTS_CACHE', 'DISK_MB', fallback=256),
+            max_text_chars=config.getint('TTS_CACHE', 'MAX_TEXT_CHARS', fallback=200),
+        )
+
+    @staticmethod
+    def key(text: str, voice: str, lang_code: str, speed: float) -> str:
+        material = json.dumps([" ".join(text.split()), voice, lang_code, float(speed)])
+        return hashlib.sha256(material.encode()).hexdigest()
+
+    def accepts(self, text: str) -> bool:
+        """Only short utterances are worth caching; long answers rarely repeat."""
+        return 0 < len(text.strip()) <= self.max_text_chars
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.npy")
+
+    def _disk_entries(self):
+        """(mtime, path, size) of every cached file; mtime doubles as last-use time."""
+        entries = []
+        with os.scandir(self.disk_dir) as it:
+            for entry in it:
+                if entry.name.endswith(".npy"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.path, stat.st_size))
+        return entries
+
+    def _remember(self, key: str, audio: np.ndarray):
+        if audio.nbytes > self.max_memory_bytes:
+            return
+        if key in self._memory:
+            self._memory_bytes -= self._memory.pop(key).nbytes
+        self._memory[key] = audio
+        self._memory_bytes += audio.nbytes
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted.nbytes
+
+    def get(self, key: str) -> np.ndarray | None:
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return audio
+            if self.disk_dir:
+                path = self._path(key)
+                try:
+                    audio = np.load(path, mmap_mode='r')
+                    os.utime(path)
+                except (OSError, ValueError):
+                    audio = None
+                if audio is not None:
+                    self._remember(key, audio)
+                    self.hits += 1
+                    return audio
+            self.misses += 1
+            return None
+
+    def put(self, key: str, chunks: list):
+        """Store the audio chunks of one utterance as a single float32 array."""
+        audio = np.concatenate([np.asarray(c, dtype=np.float32).reshape(-1) for c in chunks])
+        with self._lock:
+            self._remember(key, audio)
+            if self.disk_dir:
+                self._write_disk(key, audio)
+
+    def _write_disk(self, key: str, audio: np.ndarray):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.save(f, audio)
+            self._disk_bytes += os.path.getsize(tmp_path) - (os.path.getsize(path) if os.path.exists(path) else 0)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            LOGS.log_warning(f"Could not write TTS cache entry: {e}")
+            return
+        if self._disk_bytes > self.max_disk_bytes:
+            entries = sorted(self._disk_entries())
+            self._disk_bytes = sum(size for _, _, size in entries)
+            for _, old_path, size in entries:
+                if self._disk_bytes <= self.max_disk_bytes:
+                    break
+                try:
+                    os.unlink(old_path)
+                    self._disk_bytes -= size
+                except OSError:
+                    pass
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
@@ -1,26 +1,56 @@
 from contextlib import contextmanager, redirect_stderr, redirect_stdout
 import io
 import logging
-from kokoro import KPipeline
-import soundfile as sf
-import torch
 import numpy as np
-from threading import Thread
-from queue import Queue
+from threading import Event
 
-from pydub import AudioSegment
-from pydub.playback import _play_with_ffplay
+# torch, kokoro, soundfile and pydub are imported where they are used: importing
+# them takes seconds and main.py should show its prompt before the model is loaded
 import subprocess
 import tempfile
 
+import asyncio
+
 import LOGS
+from AUDIO_OUTPUT import NULL_SINK
+from TTS_WORKER_POOL import TTS_WORKER_POOL
 import traceback
 import os
 import warnings
 
 
+@contextmanager
+def quiet_libraries():
+    """Silence the loggers and warnings of kokoro, torch and transformers while loading.
+    Unlike suppress_all_output() it leaves fds 1/2 and sys.stdout alone, so it is safe on a
+    background thread while the main thread shows a prompt and LOGS keeps writing."""
+    # Model downloads would otherwise draw progress bars on the console
+    os.environ.setdefault("HF_HUB_DISABLE_PROGRESS_BARS", "1")
+    prev_log_levels = {}
+    try:
+        from loguru import logger as loguru_logger  # kokoro logs through loguru
+    except ImportError:
+        loguru_logger = None
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            for name in ("transformers", "torch", "kokoro", "huggingface_hub", "phonemizer"):
+                logger = logging.getLogger(name)
+                prev_log_levels[name] = logger.level
+                logger.setLevel(logging.CRITICAL)
+            if loguru_logger is not None:
+                # Left disabled: kokoro's per-sentence debug output would otherwise reach the console
+                loguru_logger.disable("kokoro")
+            yield
+    finally:
+        for name, lvl in prev_log_levels.items():
+            logging.getLogger(name).setLevel(lvl)
+
+
 @contextmanager
 def suppress_all_output():
+    """Redirect the whole process's stdout/stderr (fds included) to /dev/null.
+    Only for processes that have nothing else to print, like the TTS worker processes."""
     devnull = os.open(os.devnull, os.O_RDWR)
     saved_stdout_fd = os.dup(1)
     saved_stderr_fd = os.dup(2)
@@ -56,11 +86,34 @@ def suppress_all_output():
 
 
 class TTS_MODEL:
-    def __init__(self, lang_code='a', voice='af_heart', device=None):
+    def __init__(self, lang_code='a', voice='af_heart', device=None, sink=None, speed=1.0, cache=None, workers=0,
+                 load=True):
         self.pipeline = None
+        self.pool = None
         self.voice = voice
+        self.lang_code = lang_code
+        self.device = device
+        self.workers = workers
+        self.speed = speed
+        self.sink = sink if sink is not None else NULL_SINK()
+        self.cache = cache
+        self.ready = Event()
+        # With load=False the caller runs load() itself, e.g. on the TTS thread in the background
+        if load:
+            self.load()
+
+    def load(self):
+        """Load KPipeline (or start the worker processes). Sets self.ready even on failure."""
+        lang_code, voice, device, workers = self.lang_code, self.voice, self.device, self.workers
         try:
-            with suppress_all_output():
+            if workers > 0:
+                # Synthesis runs in separate processes; this one only plays audio
+                self.pool = TTS_WORKER_POOL(workers=workers, lang_code=lang_code, device=device)
+                LOGS.log_success(f"Initialized TTS_MODEL with {workers} worker process(es), lang_code={lang_code}, voice={voice}, device={device}")
+                return
+            from kokoro import KPipeline
+            # load() usually runs on the TTS thread while the prompt is shown: no fd redirection here
+            with quiet_libraries():
                 if device is None:
                     self.pipeline = KPipeline(lang_code=lang_code)
                 else:
@@ -68,12 +121,24 @@ class TTS_MODEL:
             LOGS.log_success(f"Initialized TTS_MODEL with lang_code={lang_code}, voice={voice}, device={device}")
         except Exception as e:
             LOGS.log_error(f"Failed to initialize TTS_MODEL: {e}\n{traceback.format_exc()}")
+        finally:
+            self.ready.set()
 
+    def warm_up(self, texts=("Ready.",)):
+        """Synthesize and discard a few texts so the first real response does not pay for
+        lazy initialization (G2P lexicons, voice tensors, allocator growth).
+        Short texts also end up in the cache, so passing common replies pre-renders them."""
+        try:
+            for _ in self.synthesize_batch(list(texts)):
+                pass
+        except Exception as e:
+            LOGS.log_warning(f"TTS warm-up failed: {e}")
 
     def synthesize(self, text):
         if self.pipeline is None:
             LOGS.log_error("Cannot synthesize: pipeline not initialized")
             return
+        import soundfile as sf
         try:
             generator = self.pipeline(text, voice=self.voice)
             for i, (gs, ps, audio) in enumerate(generator):
@@ -89,6 +154,7 @@ class TTS_MODEL:
             LOGS.log_error("Cannot play: pipeline not initialized")
             return
         try:
+            from pydub import AudioSegment
             LOGS.log_info(f"Playing response form TTS Model")
             song = AudioSegment.from_wav("RESPONSE.wav")
             self._play_silent(song)
@@ -111,42 +177,103 @@ class TTS_MODEL:
 
     def synthesize_stream(self, text):
         """Generator that yields audio chunks as they're synthesized"""
-        if self.pipeline is None:
-            LOGS.log_error("Cannot synthesize: pipeline not initialized")
+        for _, audio in self.synthesize_batch([text]):
+            yield audio
+
+    def synthesize_batch(self, texts):
+        """Generator that yields (index, audio) for several texts, in order.
+        Cached texts are served from the cache; each run of uncached texts goes
+        through a single pipeline call and is split back per text by text_index."""
+        keys = [
+            self.cache.key(text, self.voice, self.lang_code, self.speed)
+            if self.cache is not None and self.cache.accepts(text) else None
+            for text in texts
+        ]
+        cached = [self.cache.get(key) if key is not None else None for key in keys]
+
+        i = 0
+        while i < len(texts):
+            if cached[i] is not None:
+                yield i, cached[i]
+                i += 1
+                continue
+
+            j = i + 1
+            while j < len(texts) and cached[j] is None:
+                j += 1
+            run = list(range(i, j))
+
+            if self.pipeline is None and self.pool is None:
+                LOGS.log_error("Cannot synthesize: pipeline not initialized")
+                return
+            try:
+                chunks = {}
+                for run_index, audio in self._synthesize_run([texts[k] for k in run]):
+                    index = run[run_index]
+                    if keys[index] is not None:
+                        chunks.setdefault(index, []).append(self._to_frames(audio))
+                    yield index, audio
+                # Only complete utterances are cached; an interrupted run never gets here
+                for index, audio_chunks in chunks.items():
+                    self.cache.put(keys[index], audio_chunks)
+            except Exception as e:
+                LOGS.log_error(f"Synthesis failed: {e}\n{traceback.format_exc()}")
+                raise
+            i = j
+
+    def _synthesize_run(self, texts):
+        """Yield (index, audio) for texts that are not cached, from the worker pool or in-process."""
+        if self.pool is not None:
+            yield from self.pool.synthesize_batch(texts, voice=self.voice, speed=self.speed)
             return
-        try:
-            generator = self.pipeline(text, voice=self.voice)
-            for i, (gs, ps, audio) in enumerate(generator):
-                # LOGS.log_info(f"Synthesizing chunk {i}: gs={gs}, ps={ps}")
-                yield audio
-        except Exception as e:
-            LOGS.log_error(f"Synthesis failed: {e}\n{traceback.format_exc()}")
-            raise
+        for result in self.pipeline(texts, voice=self.voice, speed=self.speed):
+            if result.audio is not None:
+                yield result.text_index, result.audio
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+
+    @staticmethod
+    def _to_frames(audio_data):
+        # Convert tensor to numpy if needed (duck-typed so torch is not imported here)
+        if not isinstance(audio_data, np.ndarray) and hasattr(audio_data, "cpu"):
+            audio_data = audio_data.cpu().numpy()
+        return np.asarray(audio_data, dtype=np.float32).reshape(-1)
 
-    def play_audio_chunk(self, audio_data, sample_rate=24000):
-        """Play a single audio chunk"""
+    def play_audio_chunk(self, audio_data, sample_rate=24000, stop_event=None):
+        """Queue a single audio chunk on the output sink"""
         try:
-            # Convert tensor to numpy if needed
-            if torch.is_tensor(audio_data):
-                audio_data = audio_data.cpu().numpy()
-            
-            # Ensure it's float32 and in the range [-1, 1], then convert to int16
-            audio_data = np.clip(audio_data, -1.0, 1.0)
-            audio_data = (audio_data * 32767).astype(np.int16)
-            
-            audio_segment = AudioSegment(
-                audio_data.tobytes(),
-                frame_rate=sample_rate,
-                sample_width=2,
-                channels=1
-            )
-            # Use silent playback to avoid polluting stdout
-            self._play_silent(audio_segment)
+            self.sink.write(self._to_frames(audio_data), stop_event=stop_event)
         except Exception as e:
             LOGS.log_error(f"Playback failed: {e}\n{traceback.format_exc()}")
 
+    async def play_audio_chunk_async(self, audio_data):
+        """Queue a single audio chunk, yielding to the event loop while the sink is full"""
+        frames = self._to_frames(audio_data)
+        while len(frames):
+            accepted = self.sink.write_nowait(frames)
+            frames = frames[accepted:]
+            if len(frames):
+                # Space frees up at the playback rate
+                await asyncio.sleep(min(len(frames), 4096) / self.sink.sample_rate)
+
+    def wait_for_playback(self, stop_event=None):
+        """Block until all queued audio has been played"""
+        self.sink.drain(stop_event=stop_event)
+
+    async def wait_for_playback_async(self):
+        """Sleep until all queued audio has been played"""
+        while (remaining := self.sink.pending_seconds()) > 0:
+            await asyncio.sleep(remaining)
+
+    def stop_playback(self):
+        """Drop any audio that is queued but not yet played"""
+        self.sink.clear()
+
 
 # Example usage:
-# TTS = TTS_MODEL(lang_code='a', voice='af_heart', device='cuda' if torch.cuda.is_available() else 'cpu')
+# TTS = TTS_MODEL(lang_code='a', voice='af_heart', device='cuda')
 # text = 'Hi there! This is a test of the text-to-speech synthesis system.'
 # TTS.synthesize(text)
\ No newline at end of file
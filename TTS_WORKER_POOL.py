@@ -0,0 +1,189 @@
+"""
+Out-of-process Kokoro workers.
+Each worker process loads KPipeline once and synthesizes the texts it is sent,
+so G2P/phonemization and the model no longer compete with the pipeline threads
+for the GIL, and several workers can use several cores.
+Audio comes back through shared memory; only small (job, index, name, frames)
+tuples travel over the result queue.
+"""
+
+import itertools
+import multiprocessing as mp
+import queue
+import traceback
+from multiprocessing import shared_memory
+from threading import Lock, Thread
+
+import numpy as np
+
+import LOGS
+
+# One cancel flag per job, in a ring indexed by job id (far more slots than jobs in flight)
+CANCEL_SLOTS = 4096
+# How often a waiting generator checks that the workers are still alive
+POLL_SECONDS = 1.0
+# Result messages that carry no audio
+CONTROL_MESSAGES = ("done", "error")
+
+
+def _worker_main(job_queue, result_queue, cancelled, lang_code, device):
+    """Worker process: load the pipeline once, then serve (job_id, texts, voice, speed) jobs."""
+    from kokoro import KPipeline
+    import torch
+    from TTS_MODEL import suppress_all_output
+
+    try:
+        with suppress_all_output():
+            if device is None:
+                pipeline = KPipeline(lang_code=lang_code)
+            else:
+                pipeline = KPipeline(lang_code=lang_code, device=device)
+    except Exception:
+        result_queue.put((None, "error", traceback.format_exc(), 0))
+        return
+    result_queue.put((None, "ready", None, 0))
+
+    while True:
+        job = job_queue.get()
+        if job is None:
+            break
+        job_id, texts, voice, speed = job
+        try:
+            for result in pipeline(texts, voice=voice, speed=speed):
+                # The consumer gave up on this job (e.g. Ctrl+C): stop early
+                if cancelled[job_id % CANCEL_SLOTS]:
+                    break
+                audio = result.audio
+                if audio is None:
+                    continue
+                if torch.is_tensor(audio):
+                    audio = audio.cpu().numpy()
+                audio = np.ascontiguousarray(audio, dtype=np.float32).reshape(-1)
+                shm = shared_memory.SharedMemory(create=True, size=max(audio.nbytes, 1))
+                np.ndarray(audio.shape, dtype=np.float32, buffer=shm.buf)[:] = audio
+                # The parent unlinks the block once it has copied the audio out
+                result_queue.put((job_id, result.text_index, shm.name, len(audio)))
+                shm.close()
+            result_queue.put((job_id, "done", None, 0))
+        except Exception:
+            result_queue.put((job_id, "error", traceback.format_exc(), 0))
+
+
+def _take_audio(name: str, frames: int) -> np.ndarray:
+    """Copy audio out of a worker's shared memory block and release the block."""
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        return np.ndarray((frames,), dtype=np.float32, buffer=shm.buf).copy()
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+class TTS_WORKER_POOL:
+    def __init__(self, workers=2, lang_code='a', device=None, start_timeout=300):
+        ctx = mp.get_context("spawn")  # never fork a process that already holds torch/CUDA state
+        self._job_queue = ctx.Queue()
+        self._result_queue = ctx.Queue()
+        self._cancelled = ctx.Array('b', CANCEL_SLOTS, lock=False)
+        self._job_ids = itertools.count(1)
+        self._jobs = {}
+        self._jobs_lock = Lock()
+        self._processes = [
+            ctx.Process(target=_worker_main, name=f"tts-worker-{i}", daemon=True,
+                        args=(self._job_queue, self._result_queue, self._cancelled, lang_code, device))
+            for i in range(workers)
+        ]
+        for process in self._processes:
+            process.start()
+
+        for _ in self._processes:
+            _, status, detail, _ = self._result_queue.get(timeout=start_timeout)
+            if status != "ready":
+                self.close()
+                raise RuntimeError(f"TTS worker failed to start: {detail}")
+
+        self._dispatcher = Thread(target=self._dispatch, name="tts-pool-dispatch", daemon=True)
+        self._dispatcher.start()
+
+    @property
+    def size(self) -> int:
+        return len(self._processes)
+
+    def _dispatch(self):
+        """Route worker results to the generator waiting for that job."""
+        while True:
+            message = self._result_queue.get()
+            if message is None:
+                break
+            job_id, index, name, frames = message
+            with self._jobs_lock:
+                job = self._jobs.get(job_id)
+            if job is None:
+                # Job was abandoned; just free its audio
+                if index not in CONTROL_MESSAGES:
+                    _take_audio(name, frames)
+                continue
+            job.put(message)
+
+    def _submit(self, texts, voice, speed) -> tuple[int, queue.Queue]:
+        job_id = next(self._job_ids)
+        results = queue.Queue()
+        with self._jobs_lock:
+            self._jobs[job_id] = results
+        self._cancelled[job_id % CANCEL_SLOTS] = 0
+        self._job_queue.put((job_id, texts, voice, speed))
+        return job_id, results
+
+    def synthesize_batch(self, texts, voice, speed=1.0):
+        """Generator that yields (index, audio) in order.
+        The texts are split into contiguous groups, one per worker, that are synthesized in parallel."""
+        group_size = -(-len(texts) // self.size)
+        groups = [list(range(i, min(i + group_size, len(texts)))) for i in range(0, len(texts), group_size)]
+        jobs = [(group, *self._submit([texts[k] for k in group], voice, speed)) for group in groups]
+        finished = set()
+        try:
+            for group, job_id, results in jobs:
+                while True:
+                    try:
+                        _, index, detail, frames = results.get(timeout=POLL_SECONDS)
+                    except queue.Empty:
+                        self._check_alive()
+                        continue
+                    if index == "done":
+                        finished.add(job_id)
+                        break
+                    if index == "error":
+                        finished.add(job_id)
+                        raise RuntimeError(f"TTS worker error: {detail}")
+                    yield group[index], _take_audio(detail, frames)
+        finally:
+            with self._jobs_lock:
+                for _, job_id, results in jobs:
+                    if job_id not in finished:
+                        # Closed early (interrupt) or failed: only this call's unfinished jobs stop
+                        self._cancelled[job_id % CANCEL_SLOTS] = 1
+                    self._jobs.pop(job_id, None)
+                    # Free audio that arrived but was never consumed
+                    while True:
+                        try:
+                            _, index, detail, frames = results.get_nowait()
+                        except queue.Empty:
+                            break
+                        if index not in CONTROL_MESSAGES:
+                            _take_audio(detail, frames)
+
+    def _check_alive(self):
+        """Raise if a worker has died: the job it held will never finish."""
+        for process in self._processes:
+            if not process.is_alive():
+                raise RuntimeError(f"TTS worker {process.name} died (exit code {process.exitcode})")
+
+    def close(self):
+        for _ in self._processes:
+            self._job_queue.put(None)
+        for process in self._processes:
+            process.join(timeout=2)
+            if process.is_alive():
+                process.terminate()
+        self._result_queue.put(None)
+        LOGS.log_info("TTS worker pool stopped")
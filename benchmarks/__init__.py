@@ -0,0 +1,9 @@
+"""
+Benchmarks for the Luma pipeline. Run from the repository root, e.g.
+
+    python -m benchmarks.bench_pipeline --repeat 5
+
+Nothing here needs a GPU, Ollama or network access: the LLM is replaced by a local
+server replaying recorded NDJSON streams and audio goes to a timestamping null sink.
+Reports are written as JSON to benchmarks/results/ so runs can be compared.
+"""
@@ -0,0 +1,224 @@
+"""
+End-to-end latency benchmark of one response: text_fetcher -> segmenting/synthesis -> playback,
+using main.run_turn with the pipeline settings from config.conf.
+
+Per turn it measures, from the moment the turn starts:
+- ttft_s: first text chunk out of MAIN_MODEL
+- ttfa_s: first audio handed to the sink
+- tool_rtt_s: end of the tool-call stream -> the follow-up request reaching the server
+- turn_s: until playback of the whole answer has finished
+- rtf: synthesis compute time / seconds of audio produced
+
+    python -m benchmarks.bench_pipeline --repeat 10 --tokens-per-second 30
+    python -m benchmarks.bench_pipeline --tts kokoro --playback-speed 10
+"""
+
+import argparse
+import asyncio
+import configparser
+import contextlib
+import io
+import json
+import os
+import time
+
+import numpy as np
+
+import main
+from MAIN_MODEL import MAIN_MODEL
+from OLLAMA_CLIENT import OLLAMA_CLIENT
+from SEGMENTER import SENTENCE_SEGMENTER
+from TTS_MODEL import TTS_MODEL
+from benchmarks.common import RECORDING_SINK, environment, summarize, write_report
+from benchmarks.mock_ollama import MOCK_OLLAMA, load_scenarios, load_stream
+
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config.conf")
+METRICS = ("ttft_s", "ttfa_s", "tool_rtt_s", "turn_s", "rtf", "audio_s")
+
+
+class SYNTHETIC_RESULT:
+    def __init__(self, text, audio, text_index):
+        self.graphemes = text
+        self.phonemes = text
+        self.audio = audio
+        self.text_index = text_index
+
+
+class SYNTHETIC_PIPELINE:
+    """Stands in for KPipeline: silent audio at ~15 characters per second of speech,
+    produced in rtf times the audio's duration."""
+
+    def __init__(self, rtf: float = 0.2, sample_rate: int = 24000, chars_per_second: float = 15.0):
+        self.rtf = rtf
+        self.sample_rate = sample_rate
+        self.chars_per_second = chars_per_second
+
+    def __call__(self, text, voice=None, speed=1.0, **kwargs):
+        texts = [text] if isinstance(text, str) else text
+        for index, t in enumerate(texts):
+            seconds = max(len(t), 1) / self.chars_per_second / speed
+            time.sleep(seconds * self.rtf)
+            yield SYNTHETIC_RESULT(t, np.zeros(int(seconds * self.sample_rate), dtype=np.float32), index)
+
+
+class TIMED_PIPELINE:
+    """Wraps a pipeline and adds up the time spent producing its results."""
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+        self.compute_s = 0.0
+
+    def __call__(self, *args, **kwargs):
+        generator = self.pipeline(*args, **kwargs)
+        while True:
+            start = time.perf_counter()
+            try:
+                result = next(generator)
+            except StopIteration:
+                return
+            finally:
+                self.compute_s += time.perf_counter() - start
+            yield result
+
+
+class TIMED_MODEL:
+    """Proxy for MAIN_MODEL that notes when the first text chunk of a turn comes out."""
+
+    def __init__(self, model):
+        self.model = model
+        self.first_chunk_at = None
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    async def generate_response(self, prompt, options=None):
+        async for chunk in self.model.generate_response(prompt, options):
+            if self.first_chunk_at is None:
+                self.first_chunk_at = time.monotonic()
+            yield chunk
+
+
+def fake_tools(model, latency_s: float):
+    """Replace the system tools with sleeps so a benchmark never touches the machine."""
+    def make(name):
+        def tool(**kwargs):
+            time.sleep(latency_s)
+            return 75 if name.startswith("get_") else True
+        return tool
+    model.available_functions = {name: make(name) for name in model.available_functions}
+
+
+def pipeline_settings(config) -> dict:
+    return {
+        "text_queue_size": config.getint('PIPELINE', 'TEXT_QUEUE_SIZE', fallback=1024),
+        "audio_queue_seconds": config.getfloat('PIPELINE', 'AUDIO_QUEUE_SECONDS', fallback=4.0),
+        "batch_window": config.getfloat('PIPELINE', 'BATCH_WINDOW_MS', fallback=20) / 1000,
+        "max_batch": config.getint('PIPELINE', 'MAX_BATCH', fallback=4),
+    }
+
+
+def run_scenario(loop, scenario, mock, model, timed_model, sink, timed_pipeline, segmenter, settings) -> dict:
+    model.clear_history()
+    mock.queue([load_stream(name) for name in scenario["streams"]])
+    sink.reset()
+    timed_model.first_chunk_at = None
+    compute_before = timed_pipeline.compute_s if timed_pipeline is not None else None
+    main.stop_event.clear()
+
+    start = time.monotonic()
+    with contextlib.redirect_stdout(io.StringIO()):
+        loop.run_until_complete(main.run_turn(scenario["prompt"], segmenter=segmenter, **settings))
+    end = time.monotonic()
+
+    audio_s = sink.audio_seconds()
+    chats = [arrival for arrival, path, _ in mock.requests if path == "/api/chat"]
+    run = {
+        "ttft_s": timed_model.first_chunk_at - start if timed_model.first_chunk_at else None,
+        "ttfa_s": sink.first_write_at - start if sink.first_write_at else None,
+        "tool_rtt_s": chats[1] - mock.stream_ends[0] if len(chats) > 1 and mock.stream_ends else None,
+        "turn_s": end - start,
+        "audio_s": audio_s,
+        "rtf": (timed_pipeline.compute_s - compute_before) / audio_s
+        if timed_pipeline is not None and audio_s > 0 else None,
+    }
+    if model.stream_stats:
+        run["last_stream"] = model.stream_stats[-1].summary()
+    return run
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description="End-to-end latency benchmark with a mock Ollama server")
+    parser.add_argument("--scenarios", default=None, help="scenarios JSON (default: benchmarks/scenarios.json)")
+    parser.add_argument("--only", nargs="*", help="scenario names to run")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1, help="untimed turns before measuring")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--prefill-ms", type=float, default=150.0)
+    parser.add_argument("--tool-latency-ms", type=float, default=30.0)
+    parser.add_argument("--tts", choices=("synthetic", "kokoro"), default="synthetic")
+    parser.add_argument("--synthetic-rtf", type=float, default=0.2)
+    parser.add_argument("--playback-speed", type=float, default=1.0,
+                        help="simulate playback this many times faster than real time")
+    parser.add_argument("--out", default=None, help="results directory (default: benchmarks/results)")
+    args = parser.parse_args()
+
+    config = configparser.ConfigParser()
+    config.read(CONFIG_FILE)
+    settings = pipeline_settings(config)
+    segmenter = SENTENCE_SEGMENTER(
+        first_min_chars=config.getint('PIPELINE', 'FIRST_SEGMENT_CHARS', fallback=20),
+        min_chars=config.getint('PIPELINE', 'MIN_SEGMENT_CHARS', fallback=60),
+        max_chars=config.getint('PIPELINE', 'MAX_SEGMENT_CHARS', fallback=300)
+    )
+
+    scenarios = load_scenarios(args.scenarios) if args.scenarios else load_scenarios()
+    if args.only:
+        scenarios = [s for s in scenarios if s["name"] in args.only]
+
+    mock = MOCK_OLLAMA(args.tokens_per_second, args.prefill_ms).start()
+    client = OLLAMA_CLIENT(host=mock.url)
+    model = MAIN_MODEL(use_tools=True, client=client, fast_path=False,
+                       **MAIN_MODEL.inference_config(config))
+    fake_tools(model, args.tool_latency_ms / 1000)
+    timed_model = TIMED_MODEL(model)
+
+    sink = RECORDING_SINK(playback_speed=args.playback_speed)
+    # No cache: repeated turns would otherwise measure cache hits
+    tts = TTS_MODEL(sink=sink, load=args.tts == "kokoro")
+    if args.tts == "synthetic":
+        tts.pipeline = SYNTHETIC_PIPELINE(args.synthetic_rtf, sink.sample_rate)
+    timed_pipeline = None
+    if tts.pipeline is not None:
+        timed_pipeline = tts.pipeline = TIMED_PIPELINE(tts.pipeline)
+
+    main.main_model = timed_model
+    main.tts_model = tts
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    report = {"environment": environment(), "arguments": vars(args), "pipeline": settings, "scenarios": {}}
+    try:
+        for scenario in scenarios:
+            for _ in range(args.warmup):
+                run_scenario(loop, scenario, mock, model, timed_model, sink, timed_pipeline, segmenter, settings)
+            runs = [run_scenario(loop, scenario, mock, model, timed_model, sink, timed_pipeline, segmenter, settings)
+                    for _ in range(args.repeat)]
+            summary = summarize(runs, METRICS)
+            report["scenarios"][scenario["name"]] = {"runs": runs, "summary": summary}
+            line = "  ".join(f"{key}={summary[key]['p50']:.3f}" for key in METRICS if summary[key])
+            print(f"{scenario['name']:<28} p50: {line}")
+        report["all"] = summarize([run for s in report["scenarios"].values() for run in s["runs"]], METRICS)
+    finally:
+        loop.run_until_complete(client.aclose())
+        loop.close()
+        client.close()
+        mock.stop()
+        tts.close()
+
+    path = write_report("pipeline", report, args.out)
+    print(f"Report written to {path}")
+    print(json.dumps({key: value for key, value in report["all"].items() if value}, indent=2))
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,256 @@
+"""
+TTS micro-benchmark: per-sentence latency, real-time factor, memory and allocations of
+TTS_MODEL.synthesize_stream on CPU, across torch thread counts, voices and lang codes.
+The float32 conversion / sink hand-off path is timed separately from synthesis.
+
+    python -m benchmarks.bench_tts --threads 1 2 4 --voices af_heart am_adam --lang-codes a b
+
+Allocation figures come from tracemalloc (Python objects and numpy buffers, not torch's
+own allocator): the net change in live blocks/bytes over one synthesis and its traced
+peak. They are taken in a separate pass, so tracing does not skew the timings.
+Peak RSS is sampled while each configuration runs; the process-wide ru_maxrss never
+goes down and would carry the first configuration's peak into all later ones.
+"""
+
+import argparse
+import os
+import resource
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+from AUDIO_OUTPUT import NULL_SINK, RING_BUFFER
+from TTS_MODEL import TTS_MODEL
+from benchmarks.bench_pipeline import SYNTHETIC_PIPELINE
+from benchmarks.common import environment, percentiles, write_report
+
+# Standard corpus: short replies, typical sentences and long multi-clause answers
+CORPUS = {
+    "short": [
+        "Done.",
+        "Volume set to 40%.",
+        "Muted.",
+        "Locking the screen.",
+        "Sure, one moment.",
+    ],
+    "medium": [
+        "The screen brightness is currently at seventy five percent.",
+        "I have turned the volume down to thirty percent for you.",
+        "Tomorrow looks sunny with a high of twenty two degrees.",
+        "Python is a popular programming language known for its readability.",
+        "A black hole is a region of space where gravity is extremely strong.",
+    ],
+    "long": [
+        "A black hole forms when a massive star runs out of fuel and collapses under its own weight, "
+        "creating a region where gravity is so strong that nothing, not even light, can escape.",
+        "To get better sleep, try going to bed at the same time every night, keep your bedroom cool and dark, "
+        "and avoid screens and caffeine in the hours before you go to sleep.",
+        "The quick brown fox jumps over the lazy dog, while the cat watches from the windowsill and wonders "
+        "why anyone would bother jumping over a dog that is perfectly happy to be left alone.",
+    ],
+}
+
+
+def rss_mb() -> float:
+    """Current resident set size."""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+def process_peak_rss_mb() -> float:
+    """Peak RSS of the whole process so far (ru_maxrss); only meaningful for the run as a whole."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class RSS_SAMPLER:
+    """Polls the RSS on a thread while a block runs: `with RSS_SAMPLER() as rss: ...; rss.peak_mb`."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.start_mb = self.peak_mb = self.end_mb = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak_mb = max(self.peak_mb, rss_mb())
+
+    def __enter__(self):
+        self.start_mb = self.peak_mb = rss_mb()
+        self._thread = threading.Thread(target=self._sample, name="rss-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.end_mb = rss_mb()
+        self.peak_mb = max(self.peak_mb, self.end_mb)
+        return False
+
+
+def set_torch_threads(threads: int) -> bool:
+    try:
+        import torch
+    except ImportError:
+        return False
+    torch.set_num_threads(threads)
+    return True
+
+
+def time_sentence(tts: TTS_MODEL, text: str) -> dict:
+    start = time.perf_counter()
+    first = None
+    frames = 0
+    chunks = []
+    for audio in tts.synthesize_stream(text):
+        if first is None:
+            first = time.perf_counter() - start
+        frames += len(audio)
+        chunks.append(audio)
+    total = time.perf_counter() - start
+    audio_s = frames / tts.sink.sample_rate
+    return {
+        "first_chunk_s": first,
+        "total_s": total,
+        "audio_s": audio_s,
+        "rtf": total / audio_s if audio_s else None,
+        "chunks": chunks,
+    }
+
+
+def count_allocations(tts: TTS_MODEL, text: str) -> dict:
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for _ in tts.synthesize_stream(text):
+        pass
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    diff = after.compare_to(before, "lineno")
+    # Net change in live blocks between the snapshots, not the number of allocations made
+    return {
+        "live_blocks_delta": sum(stat.count_diff for stat in diff),
+        "live_bytes_delta": sum(stat.size_diff for stat in diff),
+        "traced_peak_bytes": peak,
+    }
+
+
+def time_conversion(tts: TTS_MODEL, chunks: list, repeat: int) -> dict:
+    """Cost of getting synthesized chunks to the output: frame conversion and the sink
+    write (null sink), plus the clipping copy into / out of a streaming sink's ring buffer."""
+    audio_s = sum(len(c) for c in chunks) / tts.sink.sample_rate
+    ring = RING_BUFFER(max(sum(len(c) for c in chunks), 1))
+    block = np.empty(1024, dtype=np.float32)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for chunk in chunks:
+            tts.play_audio_chunk(chunk)
+    play_s = (time.perf_counter() - start) / repeat
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for chunk in chunks:
+            ring.write(tts._to_frames(chunk), clip=True)
+        while ring.read_into(block, timeout=0):
+            pass
+    ring_s = (time.perf_counter() - start) / repeat
+
+    return {
+        "audio_s": audio_s,
+        "play_audio_chunk_us_per_audio_s": play_s / audio_s * 1e6 if audio_s else None,
+        "ring_path_us_per_audio_s": ring_s / audio_s * 1e6 if audio_s else None,
+    }
+
+
+def bench_config(tts: TTS_MODEL, repeat: int, allocations: bool) -> dict:
+    with RSS_SAMPLER() as rss:
+        result = _bench_config(tts, repeat, allocations)
+    result["rss_start_mb"] = rss.start_mb
+    result["rss_mb"] = rss.end_mb
+    result["rss_delta_mb"] = rss.end_mb - rss.start_mb
+    result["peak_rss_mb"] = rss.peak_mb
+    return result
+
+
+def _bench_config(tts: TTS_MODEL, repeat: int, allocations: bool) -> dict:
+    result = {"categories": {}}
+    all_runs = []
+    conversion_chunks = []
+    for category, sentences in CORPUS.items():
+        runs = []
+        for text in sentences:
+            time_sentence(tts, text)  # warm-up for this sentence length
+            for _ in range(repeat):
+                run = time_sentence(tts, text)
+                chunks = run.pop("chunks")
+                run.update(category=category, chars=len(text))
+                runs.append(run)
+            conversion_chunks.extend(chunks)
+            if allocations:
+                runs[-1].update(count_allocations(tts, text))
+        all_runs.extend(runs)
+        result["categories"][category] = {
+            key: percentiles(run.get(key) for run in runs) for key in ("first_chunk_s", "total_s", "rtf")
+        }
+    audio_s = sum(run["audio_s"] for run in all_runs)
+    result["overall_rtf"] = sum(run["total_s"] for run in all_runs) / audio_s if audio_s else None
+    result["conversion"] = time_conversion(tts, conversion_chunks, repeat)
+    result["threads"] = threading.active_count()
+    result["runs"] = all_runs
+    return result
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description="TTS latency / RTF / memory micro-benchmark")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4], help="torch intra-op thread counts")
+    parser.add_argument("--voices", nargs="+", default=["af_heart"])
+    parser.add_argument("--lang-codes", nargs="+", default=["a"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-allocations", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--synthetic", action="store_true",
+                        help="use a synthetic pipeline instead of Kokoro (checks the harness itself)")
+    parser.add_argument("--out", default=None, help="results directory (default: benchmarks/results)")
+    args = parser.parse_args()
+
+    report = {"environment": environment(), "arguments": vars(args), "baseline_rss_mb": rss_mb(), "configs": []}
+    for lang_code in args.lang_codes:
+        load_start = time.perf_counter()
+        # CPU, no cache: every sentence is really synthesized
+        tts = TTS_MODEL(lang_code=lang_code, device="cpu", sink=NULL_SINK(), load=not args.synthetic)
+        if args.synthetic:
+            tts.pipeline = SYNTHETIC_PIPELINE(rtf=0.1)
+        load_s = time.perf_counter() - load_start
+        if tts.pipeline is None:
+            report["configs"].append({"lang_code": lang_code, "error": "pipeline failed to load"})
+            continue
+        for threads in args.threads:
+            threads_set = set_torch_threads(threads)
+            for voice in args.voices:
+                tts.voice = voice
+                config = {"lang_code": lang_code, "voice": voice, "torch_threads": threads if threads_set else None,
+                          "load_s": load_s}
+                try:
+                    config.update(bench_config(tts, args.repeat, not args.no_allocations))
+                except Exception as e:
+                    config["error"] = str(e)
+                report["configs"].append(config)
+                if "error" in config:
+                    print(f"lang={lang_code} voice={voice:<10} threads={threads}: {config['error']}")
+                else:
+                    conversion = config["conversion"]["play_audio_chunk_us_per_audio_s"] or 0
+                    print(f"lang={lang_code} voice={voice:<10} threads={threads}: rtf={config['overall_rtf']:.3f} "
+                          f"medium p50={config['categories']['medium']['total_s']['p50']:.3f}s "
+                          f"peak_rss={config['peak_rss_mb']:.0f}MB conversion={conversion:.0f}us/s")
+        tts.close()
+
+    report["process_peak_rss_mb"] = process_peak_rss_mb()
+    path = write_report("tts", report, args.out)
+    print(f"Report written to {path}")
+
+
+if __name__ == "__main__":
+    main_benchmark()
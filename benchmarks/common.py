@@ -0,0 +1,96 @@
+"""
+Helpers shared by the benchmarks: percentile summaries, JSON reports and a recording sink.
+"""
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from AUDIO_OUTPUT import NULL_SINK, SAMPLE_RATE
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def percentiles(values) -> dict | None:
+    """mean/min/max and p50/p95/p99 of the values that are not None."""
+    values = [v for v in values if v is not None]
+    if not values:
+        return None
+    data = np.asarray(values, dtype=np.float64)
+    p50, p95, p99 = np.percentile(data, [50, 95, 99])
+    return {
+        "n": len(values),
+        "mean": float(data.mean()),
+        "min": float(data.min()),
+        "p50": float(p50),
+        "p95": float(p95),
+        "p99": float(p99),
+        "max": float(data.max()),
+    }
+
+
+def summarize(runs: list[dict], keys) -> dict:
+    return {key: percentiles(run.get(key) for run in runs) for key in keys}
+
+
+def _git_commit() -> str | None:
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=2,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        return result.stdout.strip() or None
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+
+
+def environment() -> dict:
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def write_report(name: str, report: dict, out_dir: str | None = None) -> str:
+    """Write a JSON report as <out_dir>/<name>-<timestamp>.json and return its path."""
+    out_dir = out_dir or RESULTS_DIR
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    return path
+
+
+class RECORDING_SINK(NULL_SINK):
+    """Null sink that records when audio arrives. Playback is simulated in real time,
+    optionally sped up so long answers do not make a benchmark run forever."""
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE, playback_speed: float = 1.0):
+        super().__init__(sample_rate, realtime=True)
+        self.playback_speed = playback_speed
+        self.reset()
+
+    def reset(self):
+        self.writes = []  # (monotonic time, frames)
+        self.frames_written = 0
+        self._reset_clock()
+
+    def _advance_clock(self, frames: int) -> float:
+        return super()._advance_clock(frames / self.playback_speed)
+
+    def write(self, audio, stop_event=None):
+        self.writes.append((time.monotonic(), len(audio)))
+        super().write(audio, stop_event)
+
+    @property
+    def first_write_at(self) -> float | None:
+        return self.writes[0][0] if self.writes else None
+
+    def audio_seconds(self) -> float:
+        return self.frames_written / self.sample_rate
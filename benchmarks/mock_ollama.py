@@ -0,0 +1,151 @@
+"""
+Local stand-in for the Ollama API that replays recorded NDJSON streams.
+POST /api/chat answers with the next queued stream, one line per token at a fixed
+token rate after a simulated prompt-evaluation delay. GET /api/tags and the model
+preload (POST /api/generate) answer immediately.
+
+Standalone, it serves one scenario over and over for manual runs of main.py:
+
+    python -m benchmarks.mock_ollama --port 11434 --scenario explanation
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STREAMS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "streams")
+SCENARIOS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scenarios.json")
+
+
+def load_stream(name: str) -> list[bytes]:
+    """Lines of a recorded stream, each ending in a newline."""
+    with open(os.path.join(STREAMS_DIR, name), "rb") as f:
+        return [line.rstrip(b"\n") + b"\n" for line in f if line.strip()]
+
+
+def load_scenarios(path: str = SCENARIOS_FILE) -> list[dict]:
+    with open(path) as f:
+        return json.load(f)
+
+
+class MOCK_OLLAMA:
+    def __init__(self, tokens_per_second: float = 50.0, prefill_ms: float = 150.0, host: str = "127.0.0.1",
+                 port: int = 0, models=("llama3.2:latest",), loop_streams: bool = False):
+        self.tokens_per_second = tokens_per_second
+        self.prefill = prefill_ms / 1000
+        self.models = list(models)
+        self.loop_streams = loop_streams
+        self._streams = []
+        self._lock = threading.Lock()
+        self.requests = []     # (arrival monotonic time, path, payload)
+        self.stream_ends = []  # monotonic time each chat stream finished sending
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def queue(self, streams: list[list[bytes]]):
+        """Set the streams answered by the next chat requests, in order."""
+        with self._lock:
+            self._streams = list(streams)
+            self.requests.clear()
+            self.stream_ends.clear()
+
+    def _next_stream(self) -> list[bytes]:
+        with self._lock:
+            if not self._streams:
+                return [b'{"message":{"role":"assistant","content":""},"done":true,"done_reason":"stop"}\n']
+            stream = self._streams.pop(0)
+            if self.loop_streams:
+                self._streams.append(stream)
+            return stream
+
+    def _handler(self):
+        mock = self
+
+        class HANDLER(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, obj):
+                body = json.dumps(obj).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._send_json({"models": [{"name": name} for name in mock.models]})
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                with mock._lock:
+                    mock.requests.append((time.monotonic(), self.path, payload))
+                if self.path == "/api/generate":
+                    self._send_json({"model": payload.get("model"), "response": "", "done": True})
+                elif self.path == "/api/chat":
+                    self._stream(mock._next_stream())
+                else:
+                    self.send_error(404)
+
+            def _stream(self, lines):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                # Prompt evaluation, then one token per interval on a fixed schedule
+                start = time.monotonic() + mock.prefill
+                interval = 1.0 / mock.tokens_per_second if mock.tokens_per_second > 0 else 0.0
+                for i, line in enumerate(lines):
+                    delay = start + i * interval - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+                with mock._lock:
+                    mock.stream_ends.append(time.monotonic())
+
+        return HANDLER
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve recorded Ollama streams")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--scenario", default="explanation", help="scenario name from scenarios.json")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--prefill-ms", type=float, default=150.0)
+    args = parser.parse_args()
+
+    scenario = next(s for s in load_scenarios() if s["name"] == args.scenario)
+    mock = MOCK_OLLAMA(args.tokens_per_second, args.prefill_ms, port=args.port, loop_streams=True)
+    mock.queue([load_stream(name) for name in scenario["streams"]])
+    print(f"Replaying '{scenario['name']}' on {mock.url}")
+    try:
+        mock._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
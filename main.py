@@ -1,78 +1,69 @@
+from STARTUP_TIMELINE import STARTUP_TIMELINE
+startup_timeline = STARTUP_TIMELINE()
+
 import traceback
 import tests
 import LOGS
+import TRACING
 import sys
-import subprocess
 import os
 import shutil
-from time import sleep
 import configparser
-import re
-from threading import Thread, Event
-from queue import Queue, Empty
+from threading import Event
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import numpy as np
 import signal
 
 from MAIN_MODEL import MAIN_MODEL
+from OLLAMA_CLIENT import OLLAMA_CLIENT
+from HISTORY import HISTORY_MANAGER
 from TTS_MODEL import TTS_MODEL
+from AUDIO_OUTPUT import create_sink
+from TTS_CACHE import TTS_CACHE
+from SEGMENTER import SENTENCE_SEGMENTER
+from QUEUES import AUDIO_QUEUE, METERED_QUEUE
+from AUDIO_OUTPUT import SAMPLE_RATE
+from INTENT_ROUTER import ACKNOWLEDGEMENTS, DEFAULT_ACKNOWLEDGEMENT, TEMPLATES
+from SERVER import LUMA_SERVER
 from SYSTEM_CALLS import *
 
+startup_timeline.mark("imports")
+
 # Global stop event for interrupting response
 stop_event = Event()
+# Set by the first turn: background pre-rendering of fixed replies then stops for good
+turn_started = Event()
 main_model = None
 tts_model = None
+# Kokoro is CPU/GPU bound and not thread-safe: it gets exactly one worker thread
+tts_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts")
 
 
-def start_ollama_background():
+def start_ollama_background(client):
     """Start ollama serve on the HOST machine using nsenter if not already running."""
-    curl_path = shutil.which('curl')
-    if not curl_path:
-        LOGS.log_error("curl not found. Cannot check/manage Ollama.")
-        return False
+    # Check if ollama is already running
+    if client.is_ready():
+        LOGS.log_info("Ollama is already running")
+        return True
 
-    nsenter_path = shutil.which('nsenter')
-    if not nsenter_path:
+    if IN_DOCKER and not shutil.which('nsenter'):
         LOGS.log_error("nsenter not found. Cannot start Ollama on host.")
         return False
 
-    # Check if ollama is already running
-    try:
-        result = subprocess.run(
-            [curl_path, '-s', 'http://localhost:11434/api/tags'],
-            capture_output=True,
-            timeout=2
-        )
-        if result.returncode == 0:
-            LOGS.log_info("Ollama is already running")
-            return True
-    except:
-        pass
-    
     # Start ollama on HOST using nsenter (run in host's PID/mount namespace)
     LOGS.log_info("Starting Ollama on host via nsenter...")
     try:
-        # nsenter with PID 1 enters the host's namespaces
-        # -t 1: target PID 1 (init process on host)
-        # -m: mount namespace
-        # -u: UTS namespace  
-        # -n: network namespace
-        # -i: IPC namespace
+        # execute_on_host goes through the persistent host agent (started once with
+        # nsenter -t 1 -m -u -n -i, i.e. PID 1's mount/UTS/network/IPC namespaces)
+        # and falls back to a one-off nsenter when the agent is unavailable.
         # Start ollama with nohup and redirect output to suppress GIN logs
-        subprocess.Popen(
-            [nsenter_path, '-t', '1', '-m', '-u', '-n', '-i', '--', 
-             'sh', '-c', 'nohup ollama serve > /dev/null 2>&1 &'],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL
-        )
-        sleep(3)  # Give ollama time to start
-        
-        # Verify it started
-        result = subprocess.run(
-            [curl_path, '-s', 'http://localhost:11434/api/tags'],
-            capture_output=True,
-            timeout=5
-        )
-        if result.returncode == 0:
+        success, error = execute_on_host('nohup ollama serve > /dev/null 2>&1 &')
+        if not success:
+            LOGS.log_error(f"Failed to start Ollama: {error}")
+            return False
+        # Ready as soon as it answers instead of after a fixed delay
+        if client.wait_until_ready(timeout=30.0):
             LOGS.log_success("Ollama started successfully on host")
             return True
         else:
@@ -82,108 +73,123 @@ def start_ollama_background():
         LOGS.log_error(f"Failed to start Ollama: {e}")
         return False
 
-def text_fetcher(user_input, text_queue, print_queue):
+async def text_fetcher(user_input, text_queue, print_queue):
     """Fetches text from the AI model and queues it for printing and TTS."""
     try:
         if main_model is None:
             LOGS.log_error("MAIN_MODEL not initialized")
-            return
-
-        for chunk in main_model.generate_response(user_input):
-            if stop_event.is_set():
-                break
-            print_queue.put(chunk)
-            text_queue.put(chunk)
+        else:
+            async for chunk in main_model.generate_response(user_input):
+                if stop_event.is_set():
+                    break
+                await print_queue.put(chunk)
+                await text_queue.put(chunk)
+    except asyncio.CancelledError:
+        raise
     except Exception as e:
         if not stop_event.is_set():
             LOGS.log_error(f"text_fetcher error: {e}")
-    finally:
-        print_queue.put(None)
-        text_queue.put(None)
+    await print_queue.put(None)
+    await text_queue.put(None)
 
-def print_worker(print_queue):
-    """Prints text chunks as they arrive - runs in main thread context."""
+async def print_worker(print_queue):
+    """Prints text chunks as they arrive."""
     sys.stdout.write("AI: ")
     sys.stdout.flush()
     while True:
-        try:
-            chunk = print_queue.get(timeout=0.1)
-        except Empty:
-            if stop_event.is_set():
-                break
-            continue
+        chunk = await print_queue.get()
         if chunk is None:
             break
         sys.stdout.write(chunk)
         sys.stdout.flush()
 
-def synthesis_worker(text_queue, audio_queue):
-    """Synthesizes audio sentence by sentence."""
-    sentence_buffer = ""
-    while True:
+async def synthesize_segments(segments, audio_queue, stop=stop_event):
+    """Runs Kokoro for a batch of segments on the TTS thread, queueing audio in order as each chunk is ready."""
+    if not segments or stop.is_set():
+        return
+    loop = asyncio.get_running_loop()
+    chunks = tts_model.synthesize_batch(segments)
+    span = TRACING.span("synthesis", segments=len(segments), chars=sum(map(len, segments)))
+    try:
+        with span:
+            start = loop.time()
+            started = set()
+            while not stop.is_set():
+                item = await loop.run_in_executor(tts_executor, next, chunks, None)
+                if item is None or stop.is_set():
+                    break
+                if item[0] not in started:
+                    # First audio of each sentence in the batch
+                    started.add(item[0])
+                    TRACING.event("sentence_audio", index=item[0], ms=round((loop.time() - start) * 1000, 3))
+                await audio_queue.put(item[1])
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        if not stop.is_set():
+            LOGS.log_error(f"synthesis_worker error: {e}")
+    finally:
+        # Close on the TTS thread, after any in-flight next() has returned
+        tts_executor.submit(chunks.close)
+
+async def collect_batch(segments, text_queue, segmenter, batch_window, max_batch):
+    """Adds segments from text that is already waiting, or arrives within batch_window seconds.
+    Returns True when the end of the response was reached."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + batch_window
+    while len(segments) < max_batch:
         try:
-            chunk = text_queue.get(timeout=0.1)
-        except Empty:
-            if stop_event.is_set():
+            chunk = text_queue.get_nowait()
+        except asyncio.QueueEmpty:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                chunk = await asyncio.wait_for(text_queue.get(), remaining)
+            except asyncio.TimeoutError:
                 break
-            continue
-            
         if chunk is None:
-            # Process any remaining text (only if not stopped)
-            if sentence_buffer.strip() and not stop_event.is_set():
-                try:
-                    if tts_model is None:
-                        LOGS.log_error("TTS_MODEL not initialized")
-                        break
-
-                    for audio in tts_model.synthesize_stream(sentence_buffer):
-                        if stop_event.is_set():
-                            break
-                        audio_queue.put(audio)
-                except Exception as e:
-                    if not stop_event.is_set():
-                        LOGS.log_error(f"synthesis_worker error: {e}")
-            break
-        
-        if stop_event.is_set():
+            segments.extend(segmenter.flush())
+            return True
+        segments.extend(segmenter.feed(chunk))
+    return False
+
+async def synthesis_worker(text_queue, audio_queue, segmenter, batch_window=0.02, max_batch=4, stop=stop_event):
+    """Synthesizes audio in batches of the segments that are ready."""
+    turn_started.set()
+    if tts_model is None:
+        LOGS.log_error("TTS_MODEL not initialized")
+    while tts_model is not None:
+        chunk = await text_queue.get()
+        if stop.is_set():
             break
-            
-        sentence_buffer += chunk
-        # Check for sentence boundaries
-        while any(p in sentence_buffer for p in ['.', '!', '?', '\n']):
-            if stop_event.is_set():
-                break
-            parts = re.split(r'(?<=[.!?\n])\s*', sentence_buffer, maxsplit=1)
-            if len(parts) > 1:
-                sentence, sentence_buffer = parts[0], parts[1]
+        finished = chunk is None
+        # Recorded only for the chunks that complete a sentence: the feed plus the batch window
+        with TRACING.span("segmentation") as span:
+            # Process any remaining text at the end
+            segments = segmenter.flush() if finished else segmenter.feed(chunk)
+            if segments and not finished:
+                # Never hold back the first segment of a response: it decides time to first audio
+                is_first = segmenter.segments_emitted == len(segments)
+                finished = await collect_batch(segments, text_queue, segmenter,
+                                               0 if is_first else batch_window, max_batch)
+            if segments:
+                span.set(segments=len(segments), chars=[len(segment) for segment in segments])
+                TRACING.count("segments_total", len(segments))
             else:
-                sentence, sentence_buffer = parts[0], ""
-            
-            if sentence.strip():
-                try:
-                    if tts_model is None:
-                        LOGS.log_error("TTS_MODEL not initialized")
-                        break
-
-                    for audio in tts_model.synthesize_stream(sentence):
-                        if stop_event.is_set():
-                            break
-                        audio_queue.put(audio)
-                except Exception as e:
-                    if not stop_event.is_set():
-                        LOGS.log_error(f"synthesis_worker error: {e}")
-    
-    audio_queue.put(None)
-
-def playback_worker(audio_queue):
+                span.discard()
+        await synthesize_segments(segments, audio_queue, stop)
+        if finished:
+            break
+
+    segmenter.reset()
+    await audio_queue.put(None)
+
+async def playback_worker(audio_queue):
     """Plays audio chunks from the queue."""
+    started = False
     while True:
-        try:
-            audio = audio_queue.get(timeout=0.1)
-        except Empty:
-            if stop_event.is_set():
-                break
-            continue
+        audio = await audio_queue.get()
         if audio is None:
             break
         if stop_event.is_set():
@@ -193,17 +199,118 @@ def playback_worker(audio_queue):
                 LOGS.log_error("TTS_MODEL not initialized")
                 break
 
-            tts_model.play_audio_chunk(audio)
+            if not started:
+                started = True
+                TRACING.event("playback_start")
+            await tts_model.play_audio_chunk_async(audio)
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             if not stop_event.is_set():
                 LOGS.log_error(f"playback_worker error: {e}")
 
+    # The sink plays asynchronously; finish the response before returning to the prompt
+    if tts_model is not None and not stop_event.is_set():
+        await tts_model.wait_for_playback_async()
+    if started:
+        TRACING.event("playback_end", interrupted=stop_event.is_set())
+
+async def run_turn(user_input, text_queue_size=1024, audio_queue_seconds=4.0, segmenter=None,
+                   batch_window=0.02, max_batch=4, queue_metrics=False):
+    """Runs one response through the fetch -> print / synthesize -> play pipeline."""
+    if segmenter is None:
+        segmenter = SENTENCE_SEGMENTER()
+    text_queue = METERED_QUEUE(maxsize=text_queue_size, name="text")
+    print_queue = METERED_QUEUE(maxsize=text_queue_size, name="print")
+    # Synthesis may run at most audio_queue_seconds (plus the sink's buffer) ahead of playback
+    sample_rate = tts_model.sink.sample_rate if tts_model is not None else SAMPLE_RATE
+    audio_queue = AUDIO_QUEUE(audio_queue_seconds, sample_rate)
+
+    # Set before the tasks are created, so they inherit the turn id
+    turn = TRACING.new_turn()
+    try:
+        with TRACING.span("turn", prompt_chars=len(user_input)) as span:
+            tasks = [
+                asyncio.create_task(text_fetcher(user_input, text_queue, print_queue)),
+                asyncio.create_task(print_worker(print_queue)),
+                asyncio.create_task(synthesis_worker(text_queue, audio_queue, segmenter, batch_window, max_batch)),
+                asyncio.create_task(playback_worker(audio_queue)),
+            ]
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                span.set(interrupted=stop_event.is_set())
+    finally:
+        TRACING.end_turn(turn)
+        if queue_metrics:
+            LOGS.log_info(f"Queue metrics: text={text_queue.metrics()} print={print_queue.metrics()} "
+                           f"audio={audio_queue.metrics()}")
+
+def warm_up_ollama(timeline):
+    """Startup thread: make sure Ollama runs, then load the chat model into memory."""
+    with timeline.stage("ollama start"):
+        running = start_ollama_background(main_model.client)
+    if running and main_model is not None:
+        try:
+            with timeline.stage("llm preload"):
+                main_model.preload()
+        except Exception as e:
+            LOGS.log_warning(f"Could not preload {main_model.model_name}: {e}")
+
+def warm_up_tts(timeline):
+    """TTS thread: load Kokoro and run a warm-up synthesis. Runs on tts_executor, so any
+    synthesis submitted later waits for the model instead of finding it missing."""
+    with timeline.stage("tts load"):
+        tts_model.load()
+    with timeline.stage("tts warm-up"):
+        tts_model.warm_up()
+
+def prerender_phrases(phrases):
+    """TTS thread, while idle: render one fixed reply into the cache, then queue the next.
+    Work submitted in between runs first, so a turn waits for one short phrase at most."""
+    if not phrases or turn_started.is_set():
+        return
+    tts_model.warm_up(phrases[:1])
+    tts_executor.submit(prerender_phrases, phrases[1:])
+
+def report_startup(timeline, tts_ready):
+    """Log the startup timeline once the TTS side is warm as well."""
+    tts_ready.result()
+    LOGS.log_info(timeline.report())
+
+def interrupt_turn(turn):
+    """SIGINT handler while a response is running: stop every stage right away."""
+    stop_event.set()
+    if tts_model is not None:
+        tts_model.stop_playback()
+    turn.cancel()
+
 if __name__ == "__main__":
     LOGS.log_info("Application started")
 
     config = configparser.ConfigParser()
     config.read('config.conf')
 
+    set_host_agent_enabled(config.getboolean('SYSTEM', 'HOST_AGENT', fallback=True))
+    LOGS.configure(
+        level=config.get('LOGGING', 'LEVEL', fallback='INFO'),
+        file=config.get('LOGGING', 'FILE', fallback='') or None,
+        max_bytes=int(config.getfloat('LOGGING', 'FILE_MAX_MB', fallback=5) * 2 ** 20),
+        backups=config.getint('LOGGING', 'FILE_BACKUPS', fallback=3),
+        color=None if config.get('LOGGING', 'COLOR', fallback='auto').lower() == 'auto'
+        else config.getboolean('LOGGING', 'COLOR')
+    )
+    TRACING.configure(
+        trace_file=config.get('TRACING', 'FILE', fallback='') or None,
+        prometheus_port=config.getint('TRACING', 'PROMETHEUS_PORT', fallback=0),
+        enable=config.getboolean('TRACING', 'ENABLED', fallback=False)
+    )
+
+    ollama_client = OLLAMA_CLIENT.from_config(config)
+
     if (config.getboolean('DEFAULT', 'PERFORM_TESTS', fallback=False)):
         try:
             tests.test_main_execution()
@@ -211,45 +318,118 @@ if __name__ == "__main__":
             # tests.test_ollama_presence()
             # tests.test_cuda_in_ollama()
 
-            start_ollama_background()
-            tests.test_ollama_models()
+            start_ollama_background(ollama_client)
+            tests.test_ollama_models(ollama_client)
         except AssertionError as e:
             LOGS.log_error(f"Test failed: {e}")
             sys.exit(1)
         finally:
             LOGS.log_info("All tests completed\n")
 
+    model_settings = dict(
+        model_name=config.get('DEFAULT', 'MAIN_MODEL', fallback='None'),
+        use_tools=config.getboolean('DEFAULT', 'USE_TOOLS', fallback=False),
+        client=ollama_client,
+        tool_workers=config.getint('TOOLS', 'WORKERS', fallback=4),
+        tool_timeout=config.getfloat('TOOLS', 'TIMEOUT', fallback=12.0),
+        fast_path=config.getboolean('TOOLS', 'FAST_PATH', fallback=True),
+        acknowledge_tools=config.getboolean('TOOLS', 'ACKNOWLEDGE', fallback=True),
+        **MAIN_MODEL.inference_config(config)
+    )
+    main_model = MAIN_MODEL(history=HISTORY_MANAGER.from_config(config), **model_settings)
+
+    audio_sink = create_sink(
+        kind=config.get('AUDIO', 'SINK', fallback='ffplay'),
+        path=config.get('AUDIO', 'SINK_PATH', fallback=None),
+        buffer_seconds=config.getfloat('AUDIO', 'BUFFER_SECONDS', fallback=3.0),
+        sample_format=config.get('AUDIO', 'FORMAT', fallback='f32')
+    )
+
+    # The model itself is loaded on the TTS thread below
+    tts_model = TTS_MODEL(
+        device= "cuda" if config.getboolean('DEFAULT', 'USE_GPU', fallback=False) is True else "cpu",
+        sink=audio_sink,
+        cache=TTS_CACHE.from_config(config),
+        workers=config.getint('TTS', 'WORKERS', fallback=0),
+        load=False
+    )
+    startup_timeline.mark("setup")
+
+    # Slow startup work runs in the background while the prompt is shown:
+    # Ollama start + model preload on a startup thread, Kokoro load + warm-up on the TTS thread
+    tts_ready = tts_executor.submit(warm_up_tts, startup_timeline)
+    if config.getboolean('TTS', 'WARMUP_TEMPLATES', fallback=True):
+        # Fixed fast-path replies ("Muted.", "Done.") are pre-rendered into the TTS cache until the first turn
+        phrases = [t for pair in TEMPLATES.values() for t in pair if "{" not in t]
+        if main_model.acknowledge_tools:
+            phrases += list(ACKNOWLEDGEMENTS.values()) + [DEFAULT_ACKNOWLEDGEMENT]
+        tts_executor.submit(prerender_phrases, list(dict.fromkeys(phrases)))
+    startup_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="startup")
+    startup_executor.submit(warm_up_ollama, startup_timeline)
+    if config.getboolean('STARTUP', 'REPORT', fallback=True):
+        # Queued behind the Ollama warm-up on the same thread, then waits for the TTS side
+        startup_executor.submit(report_startup, startup_timeline, tts_ready)
+    startup_executor.shutdown(wait=False)
+
+    # Keep cached backlight/audio probes fresh when devices are plugged in or removed
+    if config.getboolean('SYSTEM', 'HOTPLUG_MONITOR', fallback=True):
+        start_hotplug_monitor()
+
     use_gui = config.getboolean('DEFAULT', 'USE_GUI', fallback=False)
 
     if not use_gui:
         while True:
+            LOGS.flush()
             if input("Do u wish to continue? (y/n): ").lower() == 'y':
                 break
             else:
                 LOGS.log_info("Exiting application as per user request.")
                 sys.exit(0)
 
-
-
-    # Always try to start Ollama on host if not running
-    start_ollama_background()
-
-    main_model = MAIN_MODEL(
-        model_name=config.get('DEFAULT', 'MAIN_MODEL', fallback='None'),
-        use_tools=config.getboolean('DEFAULT', 'USE_TOOLS', fallback=False)
-    )
-
-    tts_model = TTS_MODEL(
-        device= "cuda" if config.getboolean('DEFAULT', 'USE_GPU', fallback=False) is True else "cpu"
-    )
-
     LOGS.log_info(f"Main AI Model set to: {config.get('DEFAULT', 'MAIN_MODEL', fallback='None')}")
     LOGS.log_info(f"TTS Model set to: {config.get('DEFAULT', 'TTS_MODEL', fallback='default')}")
     LOGS.log_info(f"Use GPU: {config.getboolean('DEFAULT', 'USE_GPU', fallback=False)}")
     LOGS.log_info(f"Use Tools: {config.getboolean('DEFAULT', 'USE_TOOLS', fallback=False)}")
 
-    while True:
+    text_queue_size = config.getint('PIPELINE', 'TEXT_QUEUE_SIZE', fallback=1024)
+    audio_queue_seconds = config.getfloat('PIPELINE', 'AUDIO_QUEUE_SECONDS', fallback=4.0)
+    queue_metrics = config.getboolean('PIPELINE', 'QUEUE_METRICS', fallback=False)
+    segmenter = SENTENCE_SEGMENTER(
+        first_min_chars=config.getint('PIPELINE', 'FIRST_SEGMENT_CHARS', fallback=20),
+        min_chars=config.getint('PIPELINE', 'MIN_SEGMENT_CHARS', fallback=60),
+        max_chars=config.getint('PIPELINE', 'MAX_SEGMENT_CHARS', fallback=300)
+    )
+    batch_window = config.getfloat('PIPELINE', 'BATCH_WINDOW_MS', fallback=20) / 1000
+    max_batch = config.getint('PIPELINE', 'MAX_BATCH', fallback=4)
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    if use_gui:
+        # Headless: serve the local API for the GUI and other clients until Ctrl+C / SIGTERM.
+        # Every session gets its own model and history; TTS, tool threads and the Ollama client are shared
+        server = LUMA_SERVER.from_config(
+            config,
+            lambda: MAIN_MODEL(history=HISTORY_MANAGER.from_config(config), tool_executor=main_model.tool_executor,
+                               **model_settings),
+            tts_model,
+            synthesis_worker
+        )
+        serving = loop.create_task(server.serve_forever())
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, serving.cancel)
+        try:
+            loop.run_until_complete(serving)
+        except asyncio.CancelledError:
+            LOGS.log_info("Server stopped.")
+        except OSError as e:
+            LOGS.log_error(f"Could not start the server: {e}")
+        finally:
+            loop.run_until_complete(server.close())
+
+    while not use_gui:
         try:
+            LOGS.flush()
             user_input = input("You: ")
             if user_input.lower() in ['exit', 'quit']:
                 LOGS.log_info("Exiting application.")
@@ -257,39 +437,18 @@ if __name__ == "__main__":
 
             # Reset stop event for new response
             stop_event.clear()
-            
-            text_queue = Queue()
-            audio_queue = Queue()
-            print_queue = Queue()
-
-            # Start threads - separate printing from synthesis
-            t_fetcher = Thread(target=text_fetcher, args=(user_input, text_queue, print_queue))
-            t_printer = Thread(target=print_worker, args=(print_queue,))
-            t_synth = Thread(target=synthesis_worker, args=(text_queue, audio_queue))
-            t_playback = Thread(target=playback_worker, args=(audio_queue,))
-
-            t_fetcher.start()
-            t_printer.start()
-            t_synth.start()
-            t_playback.start()
-
-            # Wait for threads with interrupt handling
+
+            turn = loop.create_task(run_turn(user_input, text_queue_size, audio_queue_seconds, segmenter,
+                                              batch_window, max_batch, queue_metrics))
+            # Ctrl+C during response - cancel the turn and continue to next prompt
+            loop.add_signal_handler(signal.SIGINT, interrupt_turn, turn)
             try:
-                while t_fetcher.is_alive() or t_printer.is_alive() or t_synth.is_alive() or t_playback.is_alive():
-                    t_fetcher.join(timeout=0.1)
-                    t_printer.join(timeout=0.1)
-                    t_synth.join(timeout=0.1)
-                    t_playback.join(timeout=0.1)
-            except KeyboardInterrupt:
-                # Ctrl+C during response - stop all workers and continue to next prompt
+                loop.run_until_complete(turn)
+            except asyncio.CancelledError:
                 print("\n[Interrupted]")
-                stop_event.set()
-                # Wait for threads to finish cleanly
-                t_fetcher.join(timeout=1)
-                t_printer.join(timeout=1)
-                t_synth.join(timeout=1)
-                t_playback.join(timeout=1)
                 continue
+            finally:
+                loop.remove_signal_handler(signal.SIGINT)
 
             print()  # newline after response
 
@@ -301,3 +460,13 @@ if __name__ == "__main__":
         except Exception as e:
             LOGS.log_error(f"An error occurred: {e}\n{traceback.format_exc()}")
 
+    loop.run_until_complete(ollama_client.aclose())
+    loop.close()
+    tts_executor.shutdown(wait=False)
+    tts_model.close()
+    audio_sink.close()
+    ollama_client.close()
+    stop_hotplug_monitor()
+    stop_host_agent()
+    TRACING.shutdown()
+
@@ -2,6 +2,7 @@ import subprocess
 from colored import fg, attr
 import LOGS
 from SYSTEM_CALLS import execute_on_host
+from SEGMENTER import SENTENCE_SEGMENTER
 
 
 def test_main_execution():
@@ -17,11 +18,10 @@ def test_ollama_presence():
     assert output.strip() != ''
     LOGS.log_success(f"{fg('green')}[PASS]{attr('reset')} Test of ollama presence")
 
-def test_ollama_models():
-    is_success, output = execute_on_host('ollama list')
-    # result = subprocess.run(['ollama', 'list'], cap/ture_output=True, text=True)
-    assert is_success == True
-    assert 'llama3.2' in output
+def test_ollama_models(client):
+    # Model inventory comes from the API (cached by the client) instead of `ollama list`
+    assert client.is_ready()
+    assert client.has_model('llama3.2')
     LOGS.log_success(f"{fg('green')}[PASS]{attr('reset')} Test of ollama models")
 
 
@@ -42,8 +42,28 @@ def test_cuda_in_ollama():
         LOGS.log_error(f"{fg('red')}[FAIL]{attr('reset')} Test of CUDA in Ollama: {e}")
 
 
+def segment(text: str, chunk: int = 3) -> list[str]:
+    """Feed text in small chunks, as the model streams it."""
+    segmenter = SENTENCE_SEGMENTER(min_chars=0)
+    out = []
+    for i in range(0, len(text), chunk):
+        out += segmenter.feed(text[i:i + chunk])
+    return out + segmenter.flush()
+
+
+def test_segmenter_initials():
+    assert segment("Written by J. R. R. Tolkien. It is long.") == ["Written by J. R. R. Tolkien.", "It is long."]
+    assert segment("So do I. Then we agree.") == ["So do I.", "Then we agree."]
+    assert segment("I need a. Something else.") == ["I need a.", "Something else."]
+    assert segment("Take plan A. It works.") == ["Take plan A.", "It works."]
+    assert segment("Press B. then wait.") == ["Press B.", "then wait."]
+    assert segment("Meet Dr. Smith at 3.5 p.m. today.") == ["Meet Dr. Smith at 3.5 p.m. today."]
+    LOGS.log_success(f"{fg('green')}[PASS]{attr('reset')} Test of segmenter initials")
+
+
 if __name__ == "__main__":
     test_main_execution()
     test_cuda_availability()
+    test_segmenter_initials()
     # test_ollama_presence()
     # test_cuda_in_ollama()
\ No newline at end of file